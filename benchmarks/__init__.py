@@ -0,0 +1 @@
+# Benchmark suite package init.
@@ -0,0 +1,211 @@
+# benchmarks/run.py
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from functools import partial
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import REGIMES, synthetic_klines
+from src.backtest.engine import BacktestConfig, backtest, sessionize
+from src.backtest.fetch_ratio import LegPanel
+from src.bot.engine.grid import build_both_sides
+from src.bot.exchange.filters import Quantizer, SymbolFilters
+
+SUITES = {
+    "quick": {"bars": [10_000, 100_000], "levels": [10, 200]},
+    "full": {"bars": [10_000, 100_000, 1_000_000, 5_000_000], "levels": [10, 200, 2000]},
+}
+FILTERS = SymbolFilters("BTCUSDT", tick=0.1, step=0.001, min_qty=0.001, min_notional=5.0)
+
+class Case(NamedTuple):
+    name: str
+    run: Callable[[], int]  # returns how many units it processed
+    unit: str               # "bars" or "orders"
+
+def _label(n: int) -> str:
+    return f"{n // 1_000_000}M" if n >= 1_000_000 and n % 1_000_000 == 0 else f"{n // 1000}k"
+
+def grid_config(levels: int) -> BacktestConfig:
+    # Grid spans 6% of mid whatever the level count, inside an 8% breakout guard
+    step = 6.0 / levels
+    return BacktestConfig(symbol="BTCUSDT", levels=levels, step_pct=step, tp_pct=step, order_usdt=20.0,
+                          effective_exposure=1.2, max_range_pct=8.0)
+
+def run_backtest(frame: Callable[[], pd.DataFrame], cfg: BacktestConfig, engine: str) -> int:
+    return backtest(frame(), cfg, engine=engine).bars
+
+def run_sessionize(frame: Callable[[], pd.DataFrame], cfg: BacktestConfig) -> int:
+    df = frame()
+    sessionize(df, cfg)
+    return len(df)
+
+def run_ratio(panel: LegPanel) -> int:
+    return len(panel.ratio(*panel.symbols)[0])
+
+def run_build(levels: int, quantizer: Optional[Quantizer] = None, reps: int = 100) -> int:
+    for _ in range(reps):
+        build_both_sides(30_000.0, levels, 0.1, 0.1, quantizer)
+    return 4 * levels * reps  # an entry and a TP order per level and side
+
+def run_round_qty(um, qtys: List[float], prices: List[float]) -> int:
+    f = FILTERS
+    for q, p in zip(qtys, prices):
+        um.round_qty(q, f.step, f.min_qty, f.min_notional, p)
+    return len(qtys)
+
+def cases(suite: str, seed: int) -> Iterator[Case]:
+    sizes = SUITES[suite]
+    frames: Dict[tuple, pd.DataFrame] = {}
+
+    def frame(regime: str, n: int) -> pd.DataFrame:
+        if (regime, n) not in frames:
+            frames.clear()  # keep one dataset in memory at a time
+            frames[(regime, n)] = synthetic_klines(n, regime, seed)
+        return frames[(regime, n)]
+
+    for regime in REGIMES:
+        for n in sizes["bars"]:
+            for levels in sizes["levels"]:
+                cfg = grid_config(levels)
+                tag = f"{regime}/{_label(n)}/L{levels}"
+                data = partial(frame, regime, n)
+                # A single grid stops at the first breakout, so only the range regime runs it end to end
+                if regime == "range":
+                    for engine in ("numpy", "loop"):
+                        yield Case(f"backtest_{engine}/{tag}", partial(run_backtest, data, cfg, engine), "bars")
+                yield Case(f"sessionize/{tag}", partial(run_sessionize, data, cfg), "bars")
+
+    for n in sizes["bars"]:
+        base, quote = synthetic_klines(n, "trend", seed), synthetic_klines(n, "range", seed + 1, start=2_000.0)
+        panel = LegPanel(["BTCUSDT", "ETHUSDT"], base["time"].to_numpy(dtype="datetime64[ms]").view(np.int64),
+                         np.stack([base["high"], quote["high"]]), np.stack([base["low"], quote["low"]]),
+                         np.stack([base["close"], quote["close"]]))
+        yield Case(f"ratio/{_label(n)}", partial(run_ratio, panel), "bars")
+
+    quant = Quantizer(FILTERS)
+    for levels in sizes["levels"]:
+        yield Case(f"build_both_sides/L{levels}", partial(run_build, levels), "orders")
+        yield Case(f"build_both_sides_quantized/L{levels}", partial(run_build, levels, quant), "orders")
+
+    rng = np.random.default_rng(seed)
+    qtys, prices = rng.uniform(0.0001, 0.05, 1_000_000), rng.uniform(20_000.0, 40_000.0, 1_000_000)
+    yield Case("quantizer_qtys/1M", lambda: len(quant.qtys(qtys, prices)), "orders")
+    try:
+        from src.bot.exchange.binance import BinanceUM
+    except ImportError as e:  # binance-connector missing: skip the Decimal path
+        print(f"skip round_qty: {e}", file=sys.stderr)
+        return
+    um = BinanceUM("", "", client=object())
+    yield Case("round_qty/20k", partial(run_round_qty, um, qtys[:20_000].tolist(), prices[:20_000].tolist()), "orders")
+
+def measure(case: Case, repeat: int, memory: bool, min_sec: float = 0.5) -> dict:
+    """Best wall-clock time of at least ``repeat`` runs, more for fast cases until ``min_sec`` is
+    spent (at most 100); peak traced allocation from one extra run."""
+    best, units, runs, spent = float("inf"), 0, 0, 0.0
+    gc.collect()
+    gc.disable()  # as timeit does: a collection landing in one run is noise, not the case's cost
+    try:
+        while runs < repeat or (spent < min_sec and runs < 100):
+            t0 = time.perf_counter()
+            units = case.run()
+            dt = time.perf_counter() - t0
+            best, runs, spent = min(best, dt), runs + 1, spent + dt
+    finally:
+        gc.enable()
+    out = {"seconds": best, "units": units, "throughput": units / best, "unit": f"{case.unit}/s"}
+    if memory:
+        tracemalloc.start()
+        try:
+            case.run()
+            out["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+    return out
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Cases that got slower, or used more memory, than ``baseline`` by more than ``tolerance``."""
+    bad = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if b is None:
+            continue
+        if r["throughput"] < b["throughput"] * (1 - tolerance):
+            bad.append(f"{name}: {r['throughput']:,.0f} {r['unit']} vs baseline {b['throughput']:,.0f} "
+                       f"({r['throughput'] / b['throughput'] - 1:+.0%})")
+        # 1 MB slack so tiny cases do not trip on allocator noise
+        if "peak_mb" in r and "peak_mb" in b and r["peak_mb"] > b["peak_mb"] * (1 + tolerance) + 1.0:
+            bad.append(f"{name}: peak {r['peak_mb']:.1f} MB vs baseline {b['peak_mb']:.1f} MB")
+    return bad
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Time the backtester and grid hot paths on synthetic klines")
+    ap.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    ap.add_argument("--filter", default="", help="only run cases whose name contains this")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run (peak memory)")
+    ap.add_argument("--out", default="bench.json")
+    ap.add_argument("--baseline", default="benchmarks/baseline.json")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown / memory growth (0.25 = 25%%)")
+    ap.add_argument("--update", "--save-baseline", dest="update", action="store_true",
+                    help="store these results as the new baseline")
+    ap.add_argument("--allow-missing", action="store_true", help="exit 0 when there is no baseline to compare with")
+    return ap.parse_args()
+
+def main():
+    a = parse_args()
+    results = {}
+    for case in cases(a.suite, a.seed):
+        if a.filter not in case.name:
+            continue
+        r = results[case.name] = measure(case, a.repeat, not a.no_memory)
+        mem = f"  peak={r['peak_mb']:8.1f} MB" if "peak_mb" in r else ""
+        print(f"{case.name:<44} {r['seconds'] * 1000:10.2f} ms  {r['throughput']:14,.0f} {r['unit']}{mem}", flush=True)
+
+    report = {
+        "meta": {"suite": a.suite, "seed": a.seed, "commit": _commit(), "python": platform.python_version(),
+                 "numpy": np.__version__, "pandas": pd.__version__, "machine": platform.platform()},
+        "results": results,
+    }
+    with open(a.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"-> {a.out}")
+
+    if a.update:
+        with open(a.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved -> {a.baseline}")
+        return
+    try:
+        with open(a.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"No baseline at {a.baseline}; record one with --update")
+        if a.allow_missing:
+            return
+        sys.exit(1)
+    bad = compare(results, baseline["results"], a.tolerance)
+    if bad:
+        print(f"=== {len(bad)} REGRESSION(S) vs {a.baseline} (commit {baseline['meta'].get('commit')}) ===")
+        for line in bad:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"No regressions vs {a.baseline} (tolerance {a.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/synthetic.py
+import numpy as np
+import pandas as pd
+
+REGIMES = ("trend", "range", "breakout")
+T0_MS = 1_704_067_200_000  # 2024-01-01 UTC
+
+def _ar1(noise: np.ndarray, a: float, block: int = 256) -> np.ndarray:
+    """``x[t] = a * x[t-1] + noise[t]`` (x[-1] = 0), one matrix product per ``block`` bars."""
+    n = len(noise)
+    nb = -(-n // block)
+    e = np.zeros(nb * block)
+    e[:n] = noise
+    lag = np.arange(block)[:, None] - np.arange(block)[None, :]
+    kernel = np.where(lag >= 0, a ** np.maximum(lag, 0), 0.0)
+    local = e.reshape(nb, block) @ kernel.T  # each block started from zero
+    decay = a ** np.arange(1, block + 1)
+    carry = 0.0
+    for b in range(nb):
+        local[b] += decay * carry
+        carry = local[b, -1]
+    return local.ravel()[:n]
+
+def _level(n: int, regime: str, rng: np.random.Generator) -> np.ndarray:
+    """Log-price the bars revert to: flat, a triangle wave, or flat legs joined by jumps."""
+    if regime == "range":
+        return np.zeros(n)
+    if regime == "trend":
+        period, amp = 40_000, 0.15
+        phase = (np.arange(n) / period + 0.25) % 1.0  # starts at 0, rising
+        return amp * (1 - 4 * np.abs(phase - 0.5))
+    if regime == "breakout":
+        at = np.flatnonzero(rng.random(n) < 1 / 20_000)
+        steps = np.zeros(n)
+        level = 0.0
+        for i in at.tolist():
+            # Jump 3-8%, back towards the start once price has wandered 20% away
+            size = rng.uniform(0.03, 0.08) * (rng.choice((-1.0, 1.0)) if abs(level) < 0.2 else -np.sign(level))
+            steps[i] = size
+            level += size
+        return np.cumsum(steps)
+    raise ValueError(f"Unknown regime {regime!r}; expected one of {REGIMES}")
+
+def synthetic_klines(n: int, regime: str = "range", seed: int = 0, start: float = 30_000.0,
+                     vol: float = 0.001, interval_ms: int = 60_000) -> pd.DataFrame:
+    """Deterministic OHLC frame with the kline store's schema (``time`` as UTC datetimes).
+
+    Log-price is an AR(1) around a regime level (see ``_level``), so it stays bounded at any
+    length: ``range`` oscillates within about 1%, ``trend`` swings +-15% every 40k bars and
+    ``breakout`` jumps to a new level every ~20k bars.
+    """
+    rng = np.random.default_rng(seed)
+    theta = 0.002 if regime == "trend" else 0.01
+    x = _level(n, regime, rng) + _ar1(rng.normal(0.0, vol, n), 1.0 - theta)
+    close = start * np.exp(x)
+    open_ = np.concatenate(([start], close[:-1]))
+    wick = np.exp(np.abs(rng.normal(0.0, vol / 2, (2, n))))
+    t = T0_MS + interval_ms * np.arange(n, dtype=np.int64)
+    return pd.DataFrame({
+        "time": pd.to_datetime(t, unit="ms", utc=True),
+        "open": open_,
+        "high": np.maximum(open_, close) * wick[0],
+        "low": np.minimum(open_, close) / wick[1],
+        "close": close,
+        "volume": np.ones(n),
+        "close_time": pd.to_datetime(t + interval_ms - 1, unit="ms", utc=True),
+    })
@@ -0,0 +1,123 @@
+# src/backtest/cache.py
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+from dataclasses import fields
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from src.backtest.series import DTYPES
+
+log = logging.getLogger("fgrid.cache")
+
+DEFAULT_CACHE_DIR = os.path.join(os.getenv("FGRID_DATA_DIR", "data"), "results")
+DEFAULT_CACHE_MB = 512
+
+_SRC = Path(__file__).resolve().parents[1]
+# Everything a cached result depends on besides the data and the config
+ENGINE_SOURCES = ["backtest/engine.py", "backtest/funding.py", "backtest/series.py", "backtest/cache.py",
+                  "bot/engine/grid.py", "bot/exchange/filters.py"]
+
+@lru_cache(maxsize=1)
+def engine_version() -> str:
+    """Hash of the engine's source files, so editing any of them invalidates every entry."""
+    h = hashlib.sha256()
+    for name in ENGINE_SOURCES:
+        h.update(name.encode())
+        h.update((_SRC / name).read_bytes())
+    return h.hexdigest()
+
+def _update(h, v: Any):
+    if isinstance(v, np.ndarray):
+        a = np.ascontiguousarray(v)
+        h.update(f"{a.dtype.str}{a.shape}".encode())
+        h.update(memoryview(a).cast("B"))
+    elif hasattr(v, "__dataclass_fields__"):
+        h.update(type(v).__name__.encode())
+        for f in fields(v):
+            h.update(f.name.encode())
+            _update(h, getattr(v, f.name))
+    else:
+        h.update(repr(v).encode())
+
+class ResultCache:
+    """Content-addressed backtest results on disk: ``<root>/<key>/result.pkl`` plus the per-bar
+    series columns when the run wrote them. The key hashes the candle arrays, every config field
+    and ``engine_version()``, so changed data or code simply misses. Entries are evicted least
+    recently used once the cache grows past ``max_mb``."""
+
+    def __init__(self, root: Optional[str] = None, max_mb: float = DEFAULT_CACHE_MB):
+        self.root = Path(root or DEFAULT_CACHE_DIR)
+        self.max_bytes = int(max_mb * 2**20)
+
+    def key(self, kind: str, arrays: Sequence[np.ndarray], cfg, *extra) -> str:
+        h = hashlib.sha256()  # hardware-accelerated; the candle bytes dominate
+        for v in (engine_version(), kind, *extra, cfg, *arrays):
+            _update(h, v)
+        return h.hexdigest()
+
+    def get(self, key: str, series: Optional[str] = None):
+        """Cached value for ``key`` (its series copied to ``series``), or None on a miss."""
+        d = self.root / key
+        try:
+            if series is not None and not (d / "equity.npy").exists():
+                return None  # cached without the series it is asked for now
+            with open(d / "result.pkl", "rb") as f:
+                value = pickle.load(f)
+            if series is not None:
+                Path(series).mkdir(parents=True, exist_ok=True)
+                for c in DTYPES:
+                    shutil.copyfile(d / f"{c}.npy", Path(series) / f"{c}.npy")
+            os.utime(d / "result.pkl")  # last use, for LRU eviction
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            if not isinstance(e, FileNotFoundError):
+                log.warning(f"Dropping unreadable cache entry {key}: {e}")
+                shutil.rmtree(d, ignore_errors=True)
+            return None
+        return value
+
+    def put(self, key: str, value, series: Optional[str] = None):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".{key}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        if series is not None:
+            for c in DTYPES:
+                shutil.copyfile(Path(series) / f"{c}.npy", tmp / f"{c}.npy")
+        with open(tmp / "result.pkl", "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        d = self.root / key
+        shutil.rmtree(d, ignore_errors=True)
+        try:
+            os.replace(tmp, d)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # another process stored it first
+        self.evict(keep=key)
+
+    def evict(self, keep: Optional[str] = None):
+        """Delete least recently used entries until the cache fits in ``max_mb``."""
+        entries, total = [], 0
+        for d in self.root.iterdir():
+            if d.name.startswith(".") or not d.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in d.iterdir())
+                used = (d / "result.pkl").stat().st_mtime
+            except OSError:
+                continue
+            entries.append((used, size, d))
+            total += size
+        for used, size, d in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if d.name != keep:
+                shutil.rmtree(d, ignore_errors=True)
+                total -= size
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -1,9 +1,16 @@
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import List, Tuple
+from heapq import heappop, heappush
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from src.bot.engine.grid import BothSidesGrid, build_both_sides
+from src.backtest.cache import ResultCache
+from src.backtest.funding import FlatFunding, FundingHistory
+from src.backtest.series import SeriesWriter
+from src.bot.engine.grid import LEVEL_DONE, LEVEL_IDLE, LEVEL_OPEN, BothSidesGrid, GridSide, build_both_sides
+from src.bot.exchange.filters import Quantizer, SymbolFilters
 
 @dataclass
 class BacktestConfig:
@@ -14,7 +21,11 @@ class BacktestConfig:
     order_usdt: float
     effective_exposure: float
     max_range_pct: float
-    funding_bps_8h: float = 0.0  # basis points per 8h (e.g., 1.0 = 0.01%)
+    funding_bps_8h: float = 0.0  # basis points per 8h (e.g., 1.0 = 0.01%), used when ``funding`` is None
+    filters: Optional[SymbolFilters] = None  # round prices/qty like the live bot when set
+    funding: Optional[FundingHistory] = None  # real funding events (see store.load_funding)
+
+_NEVER = np.iinfo(np.int64).max  # bar index of an event that did not happen
 
 @dataclass
 class BacktestResult:
@@ -22,33 +33,253 @@ class BacktestResult:
     cycles_short: int
     pnl_long: float
     pnl_short: float
-    total_pnl: float
-    winrate: float
+    total_pnl: float              # grid PnL plus funding
+    winrate: float                # % of round trips in profit: cycles, plus levels still open marked at the end
     bars: int
     stopped_by_breakout: bool
+    # Mark-to-market at each bar's close (breakout bar: at the guard). Zero when no closes were given.
+    unrealized_pnl: float = 0.0   # levels still open at the end
+    max_drawdown: float = 0.0     # USDT below the running peak of realized + unrealized PnL
+    max_under_water_bars: int = 0  # longest run of bars below that peak
+    peak_exposure: float = 0.0    # largest gross open notional, USDT
+    # Funding on the quantity held into each settlement (needs bar times too); negative = paid
+    funding_long: float = 0.0
+    funding_short: float = 0.0
 
-@dataclass
-class LevelState:
-    entry: float
-    tp: float
-    open: bool = False  # True once entry is filled and TP is resting
-    done: bool = False  # True once TP hit; we do not re-arm the level in this simple bot
-
-def _build_states(grid: BothSidesGrid) -> Tuple[List[LevelState], List[LevelState]]:
-    longs = [LevelState(entry=e, tp=tp) for e, tp in zip(grid.longs.entries, grid.longs.tps)]
-    shorts = [LevelState(entry=e, tp=tp) for e, tp in zip(grid.shorts.entries, grid.shorts.tps)]
-    return longs, shorts
-
-def backtest(df: pd.DataFrame, cfg: BacktestConfig) -> BacktestResult:
+class _SideBook:
+    """One grid side's level state for the bar loop, as arrays instead of per-level objects.
+
+    Prices are signed so both sides ascend away from mid (longs: -price, shorts: +price). The
+    levels a bar's extreme reaches are then a prefix found by binary search, and since a level is
+    never re-armed only the new part of that prefix is opened. Open levels wait in a heap keyed by
+    signed TP, so a bar touches only the levels it opens or closes, not the whole grid.
+    """
+    __slots__ = ("entries", "tps", "keys", "tp_keys", "state", "armed", "waiting", "opened_at", "closed_at")
+
+    def __init__(self, side: GridSide, sign: float):
+        self.entries = side.entries.tolist()
+        self.tps = side.tps.tolist()
+        self.keys = (sign * side.entries).tolist()
+        self.tp_keys = (-sign * side.tps).tolist()
+        self.state = np.zeros(len(side), dtype=np.int8)  # LEVEL_IDLE -> LEVEL_OPEN -> LEVEL_DONE
+        self.armed = 0
+        self.waiting: List[Tuple[float, int]] = []
+        self.opened_at = np.full(len(side), _NEVER, dtype=np.int64)
+        self.closed_at = np.full(len(side), _NEVER, dtype=np.int64)
+
+    def step(self, entry_key: float, tp_key: float, bar: int) -> List[int]:
+        """Open every level with signed entry <= ``entry_key``, then close (and return, in level
+        order) every open level with signed TP <= ``tp_key``."""
+        k = bisect_right(self.keys, entry_key)
+        for i in range(self.armed, k):
+            self.state[i] = LEVEL_OPEN
+            self.opened_at[i] = bar
+            heappush(self.waiting, (self.tp_keys[i], i))
+        self.armed = max(self.armed, k)
+        hit = []
+        while self.waiting and self.waiting[0][0] <= tp_key:
+            hit.append(heappop(self.waiting)[1])
+        if hit:
+            hit.sort()
+            self.state[hit] = LEVEL_DONE
+            self.closed_at[hit] = bar
+        return hit
+
+def _grid_and_qty(mid: float, cfg: BacktestConfig) -> Tuple[BothSidesGrid, float]:
+    qty = (cfg.order_usdt * cfg.effective_exposure) / mid
+    if cfg.filters is None:
+        return build_both_sides(mid, cfg.levels, cfg.step_pct, cfg.tp_pct), qty
+    quant = Quantizer(cfg.filters)
+    grid = build_both_sides(mid, cfg.levels, cfg.step_pct, cfg.tp_pct, quantizer=quant)
+    return grid, float(quant.qtys([qty], [mid])[0])
+
+def _prepare(df: pd.DataFrame, cfg: BacktestConfig) -> pd.DataFrame:
     # Sort to be safe even if the fetcher returns ordered data
     df = df.sort_values("time").reset_index(drop=True)
     if df.empty:
         raise ValueError(f"No candles to backtest for {cfg.symbol}")
+    return df
+
+def backtest(df: pd.DataFrame, cfg: BacktestConfig, engine: str = "loop", series: Optional[str] = None,
+             cache: Optional[ResultCache] = None) -> BacktestResult:
+    """Run the both-sides grid over ``df``.
+
+    ``engine="loop"`` is the bar-by-bar reference implementation; ``engine="numpy"``
+    computes the same fills from the low/high arrays and returns an identical result.
+    With ``series`` set, the per-bar equity, open quantities and drawdown are written to that
+    directory (see ``src.backtest.series``). With ``cache`` set, a run over the same candles,
+    config and engine code is served from disk instead.
+    """
+    if engine not in ("loop", "numpy"):
+        raise ValueError(f"Unknown backtest engine: {engine!r}")
+    if cache is not None:
+        key = cache.key("backtest", _candle_arrays(df), cfg, engine)
+        res = cache.get(key, series)
+        if res is None:
+            res = backtest(df, cfg, engine, series)
+            cache.put(key, res, series)
+        return res
+    run = _backtest_loop if engine == "loop" else _backtest_numpy
+    if series is None:
+        return run(df, cfg)
+    with SeriesWriter(series) as w:
+        return run(df, cfg, w)
+
+def _candle_arrays(df: pd.DataFrame) -> List[np.ndarray]:
+    # What the engines read, in the caller's row order, as the data part of a cache key
+    return [_epoch_ms(df["time"])] + [df[c].to_numpy(dtype=float) for c in ("low", "high", "close")]
+
+def _epoch_ms(times: pd.Series) -> np.ndarray:
+    # Integer times are already epoch ms, naive datetimes are taken as UTC; read-only when it is
+    # a view of the frame's column
+    if pd.api.types.is_integer_dtype(times.dtype):
+        return times.to_numpy(dtype=np.int64)
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert("UTC").dt.tz_localize(None)
+    return times.to_numpy(dtype="datetime64[ms]").view(np.int64)
+
+def _running(carry, steps: np.ndarray) -> np.ndarray:
+    # cumsum is sequential, so continuing from the carried total gives the same floats as one pass
+    return np.cumsum(np.concatenate(([carry], steps)))[1:]
+
+def _open_levels(m: int, start: int, opened: np.ndarray, closed: np.ndarray, entries: np.ndarray,
+                 count0: int, cost0: float):
+    """Per bar of ``[start, start + m)``: number of open levels and the running sum of their
+    entries, continuing from ``count0``/``cost0``, plus each level's local close bar (``m`` when
+    it stays open)."""
+    o = np.clip(opened - start, 0, m)
+    c = np.clip(closed - start, 0, m)
+    count = _running(count0, np.bincount(o, minlength=m + 1)[:m] - np.bincount(c, minlength=m + 1)[:m])
+    cost = _running(cost0, np.bincount(o, entries, m + 1)[:m] - np.bincount(c, entries, m + 1)[:m])
+    return count, cost, c
+
+def _funding_source(cfg: BacktestConfig):
+    if cfg.funding is not None:
+        return cfg.funding
+    return FlatFunding(cfg.funding_bps_8h) if cfg.funding_bps_8h else None
+
+class _Marks:
+    """Mark-to-market stats carried from one stretch of bars to the next, so a run fed in chunks
+    gets the same drawdown, exposure and funding figures as one fed at once."""
+
+    def __init__(self, funding=None):
+        self.funding = funding       # FundingHistory / FlatFunding, or None
+        self.funding_long = 0.0
+        self.funding_short = 0.0
+        self.last_time: Optional[int] = None
+        self.realized = 0.0
+        self.long_open, self.long_cost = 0, 0.0
+        self.short_open, self.short_cost = 0, 0.0
+        self.price = float("nan")    # last mark price
+        self.unrealized = 0.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.under_water = 0         # current run of bars below the peak
+        self.max_under_water = 0
+        self.peak_exposure = 0.0
+
+    def update(self, px: np.ndarray, start: int, grid: BothSidesGrid, qty: float,
+               long_open: np.ndarray, long_close: np.ndarray,
+               short_open: np.ndarray, short_close: np.ndarray,
+               times: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Mark bars ``[start, start + len(px))`` at ``px`` and return their float32 series.
+
+        ``*_open``/``*_close`` are per-level absolute bar indexes (``_NEVER`` if it did not happen,
+        or for levels still open from an earlier stretch): a level is held from the end of its open
+        bar to the end of its close bar. ``times`` are the bars' open times (epoch ms); funding
+        is only charged when they are given.
+        """
+        m = len(px)
+        if np.isnan(px).any():
+            last = np.maximum.accumulate(np.where(np.isnan(px), -1, np.arange(m)))
+            px = np.where(last >= 0, px[np.maximum(last, 0)], self.price)
+        longs, shorts = grid.longs, grid.shorts
+        n_long, cost_long, c_long = _open_levels(m, start, long_open, long_close, longs.entries,
+                                                 self.long_open, self.long_cost)
+        n_short, cost_short, c_short = _open_levels(m, start, short_open, short_close, shorts.entries,
+                                                    self.short_open, self.short_cost)
+        realized = _running(self.realized, np.bincount(c_long, qty * (longs.tps - longs.entries), m + 1)[:m]
+                            + np.bincount(c_short, qty * (shorts.entries - shorts.tps), m + 1)[:m])
+        # The running entry sums keep rounding residue once a side is flat again
+        unrealized = (qty * np.where(n_long > 0, n_long * px - cost_long, 0.0)
+                      + qty * np.where(n_short > 0, cost_short - n_short * px, 0.0))
+        fund_long, fund_short = self._funding(px, times, qty, n_long, n_short)
+        equity = realized + fund_long + fund_short + unrealized
+        drawdown = np.maximum(np.maximum.accumulate(equity), self.peak) - equity
+
+        # Bars under water, continuing the run the previous stretch ended with
+        i = np.arange(m)
+        dry = np.maximum.accumulate(np.where(drawdown > 0, -1, i))
+        run = np.where(dry >= 0, i - dry, i + 1 + self.under_water)
+
+        self.realized = float(realized[-1])
+        self.funding_long, self.funding_short = float(fund_long[-1]), float(fund_short[-1])
+        self.long_open, self.long_cost = int(n_long[-1]), float(cost_long[-1])
+        self.short_open, self.short_cost = int(n_short[-1]), float(cost_short[-1])
+        self.price = float(px[-1])
+        self.unrealized = float(unrealized[-1])
+        self.peak = max(self.peak, float(equity.max()))
+        self.max_drawdown = max(self.max_drawdown, float(drawdown.max()))
+        self.under_water = int(run[-1])
+        self.max_under_water = max(self.max_under_water, int(run.max()))
+        self.peak_exposure = max(self.peak_exposure, float((qty * (n_long + n_short) * px).max()))
+        if times is not None:
+            self.last_time = int(times[-1])
+        return {"equity": equity.astype(np.float32), "long_qty": (qty * n_long).astype(np.float32),
+                "short_qty": (qty * n_short).astype(np.float32), "drawdown": drawdown.astype(np.float32)}
+
+    def _funding(self, px: np.ndarray, times: Optional[np.ndarray], qty: float,
+                 n_long: np.ndarray, n_short: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Running funding PnL per side. Each settlement is an as-of join on the bar index: it is
+        booked on the first bar opening at or after it, on the levels held at the end of the bar
+        before, at that bar's close."""
+        m = len(px)
+        fund_long, fund_short = np.zeros(m), np.zeros(m)
+        if self.funding is not None and times is not None:
+            lo = self.last_time if self.last_time is not None else int(times[0]) - 1
+            ft, rate = self.funding.between(lo, int(times[-1]))
+            if len(ft):
+                j = np.searchsorted(times, ft, side="left")
+                held_long = np.concatenate(([self.long_open], n_long))[j]
+                held_short = np.concatenate(([self.short_open], n_short))[j]
+                at = np.concatenate(([self.price], px))[j]
+                # Positive rates: longs pay, shorts receive
+                fund_long = np.bincount(j, np.where(held_long > 0, -rate * qty * held_long * at, 0.0), m)
+                fund_short = np.bincount(j, np.where(held_short > 0, rate * qty * held_short * at, 0.0), m)
+        return _running(self.funding_long, fund_long), _running(self.funding_short, fund_short)
+
+def _result(cycles_long: int, cycles_short: int, pnl_long: float, pnl_short: float, bars: int, stopped: bool,
+            marks: _Marks, open_long: np.ndarray, open_short: np.ndarray) -> BacktestResult:
+    # A round trip wins if it closed at its TP, or if the level still open is in profit at the last
+    # mark (the guard price after a breakout, where the bot closes it). Unmarked levels are left out.
+    trades = wins = cycles_long + cycles_short
+    if not np.isnan(marks.price):
+        trades += len(open_long) + len(open_short)
+        wins += int((open_long < marks.price).sum() + (open_short > marks.price).sum())
+    return BacktestResult(
+        cycles_long=cycles_long,
+        cycles_short=cycles_short,
+        pnl_long=pnl_long,
+        pnl_short=pnl_short,
+        total_pnl=pnl_long + pnl_short + marks.funding_long + marks.funding_short,
+        winrate=100.0 * wins / trades if trades else 0.0,
+        bars=bars,
+        stopped_by_breakout=stopped,
+        unrealized_pnl=marks.unrealized,
+        max_drawdown=marks.max_drawdown,
+        max_under_water_bars=marks.max_under_water,
+        peak_exposure=marks.peak_exposure,
+        funding_long=marks.funding_long,
+        funding_short=marks.funding_short,
+    )
+
+def _backtest_loop(df: pd.DataFrame, cfg: BacktestConfig, series: Optional[SeriesWriter] = None) -> BacktestResult:
+    df = _prepare(df, cfg)
 
     mid = float(df.iloc[0]["close"])
-    grid = build_both_sides(mid, cfg.levels, cfg.step_pct, cfg.tp_pct)
-    long_levels, short_levels = _build_states(grid)
-    qty = (cfg.order_usdt * cfg.effective_exposure) / mid
+    grid, qty = _grid_and_qty(mid, cfg)
+    longs = _SideBook(grid.longs, -1.0)
+    shorts = _SideBook(grid.shorts, 1.0)
 
     low_guard = mid * (1 - cfg.max_range_pct/100.0)
     high_guard = mid * (1 + cfg.max_range_pct/100.0)
@@ -59,50 +290,423 @@ def backtest(df: pd.DataFrame, cfg: BacktestConfig) -> BacktestResult:
     cycles_short = 0
     stopped = False
 
-    # Track fills per level so we don't double-count if price sits below/above an entry for many bars
+    # Levels are never re-armed, so a price sitting below/above an entry for many bars fills it once
     bars_processed = 0
 
-    for row in df.itertuples(index=False):
+    # NaN never touches a level: as +/-inf it also never matches in the binary searches
+    low_arr = df["low"].to_numpy(dtype=float)
+    high_arr = df["high"].to_numpy(dtype=float)
+    lows = np.where(np.isnan(low_arr), np.inf, low_arr).tolist()
+    highs = np.where(np.isnan(high_arr), -np.inf, high_arr).tolist()
+
+    for low, high in zip(lows, highs):
         bars_processed += 1
-        low = float(row.low)
-        high = float(row.high)
 
         if low < low_guard or high > high_guard:
             stopped = True
             break
 
-        for lvl in long_levels:
-            if not lvl.done and not lvl.open and low <= lvl.entry:
-                lvl.open = True
-        for lvl in short_levels:
-            if not lvl.done and not lvl.open and high >= lvl.entry:
-                lvl.open = True
-
-        for lvl in long_levels:
-            if lvl.open and high >= lvl.tp:
-                pnl_long += qty * (lvl.tp - lvl.entry)
-                cycles_long += 1
-                lvl.open = False
-                lvl.done = True
-
-        for lvl in short_levels:
-            if lvl.open and low <= lvl.tp:
-                pnl_short += qty * (lvl.entry - lvl.tp)
-                cycles_short += 1
-                lvl.open = False
-                lvl.done = True
-
-    total_pnl = pnl_long + pnl_short
-    total_cycles = cycles_long + cycles_short
-    winrate = 100.0 if total_cycles else 0.0
+        # Entries fill before TPs on the same bar, so a level can open and close within one bar
+        for i in longs.step(-low, high, bars_processed - 1):
+            pnl_long += qty * (longs.tps[i] - longs.entries[i])
+            cycles_long += 1
+        for i in shorts.step(high, -low, bars_processed - 1):
+            pnl_short += qty * (shorts.entries[i] - shorts.tps[i])
+            cycles_short += 1
 
-    return BacktestResult(
+    # Mark-to-market from the bars each level opened/closed on, as the numpy engine does
+    marks = _Marks(_funding_source(cfg))
+    px = df["close"].to_numpy(dtype=float)[:bars_processed].copy()
+    if stopped:
+        px[-1] = low_guard if low < low_guard else high_guard
+    times = None
+    if series is not None or marks.funding is not None:  # nothing else reads bar times
+        times = _epoch_ms(df["time"].iloc[:bars_processed])
+    cols = marks.update(px, 0, grid, qty, longs.opened_at, longs.closed_at, shorts.opened_at, shorts.closed_at, times)
+    if series is not None:
+        cols["time"] = times
+        series.append(cols)
+
+    return _result(cycles_long, cycles_short, pnl_long, pnl_short, bars_processed, stopped, marks,
+                   grid.longs.entries[longs.state == LEVEL_OPEN], grid.shorts.entries[shorts.state == LEVEL_OPEN])
+
+class _FirstCross:
+    """First index ``i >= start`` with ``values[i] >= threshold``, using per-block maxima
+    so a query only scans the blocks that can actually contain a hit."""
+
+    def __init__(self, values: np.ndarray, block: int = 4096):
+        self.values = values
+        self.block = block
+        self.block_max = np.maximum.reduceat(values, np.arange(0, len(values), block))
+
+    def first(self, start: int, stop: int, threshold: float) -> int:
+        """Returns ``stop`` when there is no hit in ``[start, stop)``."""
+        b = self.block
+        head_end = min(stop, (start // b + 1) * b)
+        if start < head_end:
+            hit = np.flatnonzero(self.values[start:head_end] >= threshold)
+            if hit.size:
+                return start + int(hit[0])
+        if head_end >= stop:
+            return stop
+        first_blk = head_end // b
+        last_blk = (stop - 1) // b
+        for blk in first_blk + np.flatnonzero(self.block_max[first_blk:last_blk + 1] >= threshold):
+            lo = int(blk) * b
+            hit = np.flatnonzero(self.values[lo:min(lo + b, stop)] >= threshold)
+            if hit.size:
+                return lo + int(hit[0])
+        return stop
+
+def _sum_in_fill_order(profits: np.ndarray, fill_bars: np.ndarray, total: float = 0.0) -> float:
+    # Accumulate in the same (bar, level) order as the loop so float sums match bit for bit
+    for v in profits[np.argsort(fill_bars, kind="stable")]:
+        total += float(v)
+    return total
+
+class Bars:
+    """Time-ordered low/high arrays plus the block indexes every grid run over them shares.
+    ``close`` (mark prices) and ``time`` (epoch ms) are optional and only feed the per-bar marks.
+
+    Building one is O(bars); a sweep should build it once per dataset and pass it to
+    ``backtest_bars`` for every config."""
+
+    def __init__(self, low: np.ndarray, high: np.ndarray, close: Optional[np.ndarray] = None,
+                 time: Optional[np.ndarray] = None):
+        # NaN never touches anything in the loop; +/-inf keeps that while allowing accumulate/searchsorted
+        if np.isnan(low).any():
+            low = np.where(np.isnan(low), np.inf, low)
+        if np.isnan(high).any():
+            high = np.where(np.isnan(high), -np.inf, high)
+        self.low = low
+        self.high = high
+        self.close = close
+        self.time = time
+        self.n = len(low)
+        self.high_cross = _FirstCross(high)
+        self.neg_low_cross = _FirstCross(-low)
+
+class _GridRun:
+    """One grid centred on ``mid``, fed time-ordered bars in one or more pieces.
+
+    Level states (``LEVEL_IDLE/OPEN/DONE`` per side), the PnL sums and the marks carry over between
+    ``feed`` calls, so feeding the bars in chunks gives exactly the result of feeding them at once.
+    Bars with closes are marked to market; their per-bar series go to ``series`` when given.
+    """
+
+    def __init__(self, mid: float, cfg: BacktestConfig, series: Optional[SeriesWriter] = None):
+        self.grid, self.qty = _grid_and_qty(mid, cfg)
+        self.low_guard = mid * (1 - cfg.max_range_pct/100.0)
+        self.high_guard = mid * (1 + cfg.max_range_pct/100.0)
+        self.long_state = np.zeros(len(self.grid.longs), dtype=np.int8)
+        self.short_state = np.zeros(len(self.grid.shorts), dtype=np.int8)
+        self.pnl_long = 0.0
+        self.pnl_short = 0.0
+        self.cycles_long = 0
+        self.cycles_short = 0
+        self.bars = 0
+        self.stopped = False
+        self.marks = _Marks(_funding_source(cfg))
+        self.series = series
+
+    @property
+    def needs_time(self) -> bool:
+        """Whether ``feed`` reads bar times: only funding and the series' time column use them."""
+        return self.series is not None or self.marks.funding is not None
+
+    def feed(self, bars: Bars, start: int = 0) -> int:
+        """Process ``bars[start:]``; returns the absolute breakout bar index (``bars.n`` if none).
+        Work is O(bars until breakout)."""
+        if self.stopped:
+            return start
+        n = bars.n
+        # The breakout bar ends the run before any fill on it is processed
+        stop = min(bars.high_cross.first(start, n, np.nextafter(self.high_guard, np.inf)),
+                   bars.neg_low_cross.first(start, n, np.nextafter(-self.low_guard, np.inf)))
+
+        # First entry touch per idle level: running min of low / max of high is monotonic, so
+        # searchsorted finds it. Levels still open from an earlier feed can take profit from ``start``.
+        longs, shorts = self.grid.longs, self.grid.shorts
+        long_held = self.long_state == LEVEL_OPEN
+        short_held = self.short_state == LEVEL_OPEN
+        long_open_at = self._open_at(self.long_state, start, stop,
+                                     -np.minimum.accumulate(bars.low[start:stop]), -longs.entries)
+        short_open_at = self._open_at(self.short_state, start, stop,
+                                      np.maximum.accumulate(bars.high[start:stop]), shorts.entries)
+
+        # First TP touch at or after the entry bar (same-bar entry+TP counts, as in the loop)
+        long_tp_at = np.array([bars.high_cross.first(int(e), stop, tp) if e < stop else stop
+                               for e, tp in zip(long_open_at, longs.tps)], dtype=np.int64)
+        short_tp_at = np.array([bars.neg_low_cross.first(int(e), stop, -tp) if e < stop else stop
+                                for e, tp in zip(short_open_at, shorts.tps)], dtype=np.int64)
+
+        long_done = long_tp_at < stop
+        short_done = short_tp_at < stop
+        self.pnl_long = _sum_in_fill_order(self.qty * (longs.tps[long_done] - longs.entries[long_done]),
+                                           long_tp_at[long_done], self.pnl_long)
+        self.pnl_short = _sum_in_fill_order(self.qty * (shorts.entries[short_done] - shorts.tps[short_done]),
+                                            short_tp_at[short_done], self.pnl_short)
+        self.cycles_long += int(long_done.sum())
+        self.cycles_short += int(short_done.sum())
+        self.long_state[(long_open_at < stop) & ~long_done] = LEVEL_OPEN
+        self.long_state[long_done] = LEVEL_DONE
+        self.short_state[(short_open_at < stop) & ~short_done] = LEVEL_OPEN
+        self.short_state[short_done] = LEVEL_DONE
+
+        self.stopped = stop < n
+        end = stop + 1 if self.stopped else n
+        self.bars += end - start
+        if bars.close is not None and end > start:
+            px = bars.close[start:end].astype(float)
+            if self.stopped:
+                px[-1] = self.low_guard if bars.low[stop] < self.low_guard else self.high_guard
+            cols = self.marks.update(px, start, self.grid, self.qty,
+                                     np.where((long_open_at < stop) & ~long_held, long_open_at, _NEVER),
+                                     np.where(long_done, long_tp_at, _NEVER),
+                                     np.where((short_open_at < stop) & ~short_held, short_open_at, _NEVER),
+                                     np.where(short_done, short_tp_at, _NEVER),
+                                     None if bars.time is None else bars.time[start:end])
+            if self.series is not None:
+                cols["time"] = bars.time[start:end]
+                self.series.append(cols)
+        return stop
+
+    @staticmethod
+    def _open_at(state: np.ndarray, start: int, stop: int, reach: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        at = np.full(len(state), stop, dtype=np.int64)
+        at[state == LEVEL_OPEN] = start
+        idle = state == LEVEL_IDLE
+        at[idle] = start + np.searchsorted(reach, keys[idle], side="left")
+        return at
+
+    def result(self) -> BacktestResult:
+        return _result(self.cycles_long, self.cycles_short, self.pnl_long, self.pnl_short, self.bars, self.stopped,
+                       self.marks, self.grid.longs.entries[self.long_state == LEVEL_OPEN],
+                       self.grid.shorts.entries[self.short_state == LEVEL_OPEN])
+
+def _run_grid(bars: Bars, start: int, mid: float, cfg: BacktestConfig) -> Tuple[BacktestResult, int]:
+    """One grid centred on ``mid`` from bar ``start``. Returns the result and the absolute
+    breakout bar index (``bars.n`` when the data ends first)."""
+    run = _GridRun(mid, cfg)
+    stop = run.feed(bars, start)
+    return run.result(), stop
+
+def _backtest_numpy(df: pd.DataFrame, cfg: BacktestConfig, series: Optional[SeriesWriter] = None) -> BacktestResult:
+    df = _prepare(df, cfg)
+    close = df["close"].to_numpy(dtype=float)
+    run = _GridRun(float(close[0]), cfg, series)
+    time = _epoch_ms(df["time"]) if run.needs_time else None
+    run.feed(Bars(df["low"].to_numpy(dtype=float), df["high"].to_numpy(dtype=float), close, time))
+    return run.result()
+
+def backtest_arrays(low: np.ndarray, high: np.ndarray, mid: float, cfg: BacktestConfig,
+                    close: Optional[np.ndarray] = None) -> BacktestResult:
+    """Vectorized engine on time-ordered low/high arrays with the grid centred on ``mid``.
+
+    Arrays may be read-only memmaps; they are only copied when they contain NaN. Drawdown,
+    exposure and unrealized PnL need ``close`` and stay zero without it; funding needs bar times
+    and is not charged here.
+    """
+    return backtest_bars(Bars(low, high, close), mid, cfg)
+
+def backtest_bars(bars: Bars, mid: float, cfg: BacktestConfig) -> BacktestResult:
+    """``backtest_arrays`` over prebuilt ``bars``, so many configs can share its block indexes."""
+    if bars.n == 0:
+        raise ValueError(f"No candles to backtest for {cfg.symbol}")
+    run = _GridRun(mid, cfg)
+    run.feed(bars)
+    return run.result()
+
+def backtest_chunks(chunks: Iterable[pd.DataFrame], cfg: BacktestConfig, series: Optional[str] = None) -> BacktestResult:
+    """Streaming engine: same result as ``backtest(pd.concat(chunks), cfg)``, with peak memory
+    bounded by one chunk.
+
+    ``chunks`` are time-ordered frames of candles (``time``, ``low``, ``high``, ``close``), or of
+    trades (``time``, ``price``; each trade is a bar with low = high = price). The grid is centred
+    on the first close/price. Iteration stops at the breakout, so later chunks are never read.
+    With ``series`` set, the per-bar series are written to that directory chunk by chunk.
+    """
+    if series is None:
+        return _backtest_chunks(chunks, cfg)
+    with SeriesWriter(series) as w:
+        return _backtest_chunks(chunks, cfg, w)
+
+def _backtest_chunks(chunks: Iterable[pd.DataFrame], cfg: BacktestConfig,
+                     series: Optional[SeriesWriter] = None) -> BacktestResult:
+    run: Optional[_GridRun] = None
+    last_time = None
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        if not chunk["time"].is_monotonic_increasing or (last_time is not None and chunk["time"].iloc[0] <= last_time):
+            raise ValueError("backtest_chunks needs time-ordered, non-overlapping chunks")
+        last_time = chunk["time"].iloc[-1]
+        if "price" in chunk:
+            low = high = close = chunk["price"].to_numpy(dtype=float)
+        else:
+            low, high = chunk["low"].to_numpy(dtype=float), chunk["high"].to_numpy(dtype=float)
+            close = chunk["close"].to_numpy(dtype=float)
+        if run is None:
+            run = _GridRun(float(close[0]), cfg, series)
+        run.feed(Bars(low, high, close, _epoch_ms(chunk["time"]) if run.needs_time else None))
+        if run.stopped:
+            break
+    if run is None:
+        raise ValueError(f"No candles to backtest for {cfg.symbol}")
+    return run.result()
+
+@dataclass
+class PathResults:
+    """Per-path outcome of ``backtest_paths``; row ``i`` equals ``backtest_arrays`` on path ``i``."""
+    cycles_long: np.ndarray
+    cycles_short: np.ndarray
+    pnl_long: np.ndarray
+    pnl_short: np.ndarray
+    total_pnl: np.ndarray
+    bars: np.ndarray
+    breakout_bar: np.ndarray   # index of the breakout bar, -1 when the path ended first
+
+class _FirstCross2D:
+    """``_FirstCross`` for a (paths, bars) array: one query answers every row at once, scanning
+    only the head block of each row and then the first later block whose maximum can hit."""
+
+    def __init__(self, values: np.ndarray, block: int = 256):
+        p, n = values.shape
+        full = n // block * block
+        self.values = values
+        self.block = block
+        self.n = n
+        block_max = [values[:, :full].reshape(p, -1, block).max(axis=2)]
+        if full < n:
+            block_max.append(values[:, full:].max(axis=1, keepdims=True))
+        self.block_max = np.hstack(block_max)
+        self.offsets = np.arange(block)
+
+    def _scan(self, rows: np.ndarray, blk: np.ndarray, start: np.ndarray, threshold: float) -> np.ndarray:
+        cols = blk[:, None] * self.block + self.offsets
+        inside = (cols >= start[:, None]) & (cols < self.n)
+        hit = inside & (self.values[rows[:, None], np.minimum(cols, self.n - 1)] >= threshold)
+        return np.where(hit.any(axis=1), cols[np.arange(len(rows)), hit.argmax(axis=1)], self.n)
+
+    def first(self, start: np.ndarray, threshold: float) -> np.ndarray:
+        """Per row, first index ``>= start[row]`` with ``values >= threshold``, or the row length."""
+        rows = np.arange(len(start))
+        head = np.minimum(start, self.n) // self.block
+        at = self._scan(rows, head, start, threshold)
+        later = (self.block_max >= threshold) & (np.arange(self.block_max.shape[1]) > head[:, None])
+        todo = (at == self.n) & later.any(axis=1)
+        if todo.any():
+            r = rows[todo]
+            at[r] = self._scan(r, later[r].argmax(axis=1), start[r], threshold)
+        return at
+
+def _sum_rows_in_fill_order(profits: np.ndarray, fill_bars: np.ndarray) -> np.ndarray:
+    # Row-wise _sum_in_fill_order: unfilled levels carry 0.0 and sort last, so the sums match bit for bit
+    order = np.argsort(fill_bars, axis=1, kind="stable")
+    ordered = np.take_along_axis(profits, order, axis=1)
+    total = np.zeros(len(profits))
+    for j in range(ordered.shape[1]):
+        total += ordered[:, j]
+    return total
+
+def backtest_paths(low: np.ndarray, high: np.ndarray, mid: float, cfg: BacktestConfig,
+                   block: int = 256) -> PathResults:
+    """Batched engine: the grid centred on ``mid`` over every row of (paths, bars) ``low``/``high``.
+
+    Same fills as ``backtest_arrays`` row by row, but each level is one vectorized query over all
+    paths, so the cost is O(levels x paths x block) plus one pass over the arrays.
+    """
+    if low.ndim != 2 or low.shape != high.shape or low.shape[1] == 0:
+        raise ValueError("backtest_paths needs two non-empty (paths, bars) arrays of the same shape")
+    low = np.where(np.isnan(low), np.inf, low)
+    high = np.where(np.isnan(high), -np.inf, high)
+    n = low.shape[1]
+    grid, qty = _grid_and_qty(mid, cfg)
+    longs, shorts = grid.longs, grid.shorts
+    high_cross = _FirstCross2D(high, block)
+    neg_low_cross = _FirstCross2D(-low, block)
+
+    zero = np.zeros(len(low), dtype=np.int64)
+    stop = np.minimum(high_cross.first(zero, np.nextafter(mid * (1 + cfg.max_range_pct/100.0), np.inf)),
+                      neg_low_cross.first(zero, np.nextafter(-mid * (1 - cfg.max_range_pct/100.0), np.inf)))
+
+    def side(entry_cross, tp_cross, entries, tps, sign):
+        tp_at = np.empty((len(low), len(entries)), dtype=np.int64)
+        for j, (e, tp) in enumerate(zip(entries.tolist(), tps.tolist())):
+            opened = entry_cross.first(zero, sign * e)
+            at = tp_cross.first(opened, -sign * tp)
+            tp_at[:, j] = np.where((opened < stop) & (at < stop), at, n)
+        done = tp_at < n
+        profit = np.where(done, qty * (sign * (entries - tps)), 0.0)
+        return done.sum(axis=1), _sum_rows_in_fill_order(profit, tp_at)
+
+    cycles_long, pnl_long = side(neg_low_cross, high_cross, longs.entries, longs.tps, -1.0)
+    cycles_short, pnl_short = side(high_cross, neg_low_cross, shorts.entries, shorts.tps, 1.0)
+    stopped = stop < n
+    return PathResults(
         cycles_long=cycles_long,
         cycles_short=cycles_short,
         pnl_long=pnl_long,
         pnl_short=pnl_short,
-        total_pnl=total_pnl,
-        winrate=winrate,
-        bars=bars_processed,
-        stopped_by_breakout=stopped
+        total_pnl=pnl_long + pnl_short,
+        bars=np.where(stopped, stop + 1, n),
+        breakout_bar=np.where(stopped, stop, -1),
     )
+
+@dataclass
+class SessionStats:
+    start_index: int
+    end_index: int         # breakout bar, or the last bar when the data ran out first
+    start_time: object
+    end_time: object
+    mid: float
+    cycles_long: int
+    cycles_short: int
+    pnl_long: float
+    pnl_short: float
+    total_pnl: float
+    stopped_by_breakout: bool
+
+def sessionize(df: pd.DataFrame, cfg: BacktestConfig, start_time=None,
+               cache: Optional[ResultCache] = None) -> List[SessionStats]:
+    """Auto-regrid over ``df``: run the grid until breakout, re-centre on the next bar's close, repeat.
+
+    Each session is identical to ``backtest()`` on the tail starting at its first bar, but the
+    whole run is one forward pass over shared arrays. To resume when more data arrives, call again
+    with ``start_time`` set to the last session's ``start_time`` if it was not stopped by breakout
+    (its stats are recomputed), or to the first bar after its ``end_time`` otherwise. ``cache``
+    works as in ``backtest()``.
+    """
+    if cache is not None:
+        key = cache.key("sessionize", _candle_arrays(df), cfg, start_time)
+        sessions = cache.get(key)
+        if sessions is None:
+            sessions = sessionize(df, cfg, start_time)
+            cache.put(key, sessions)
+        return sessions
+    df = _prepare(df, cfg)
+    times = df["time"]
+    close = df["close"].to_numpy(dtype=float)
+    bars = Bars(df["low"].to_numpy(dtype=float), df["high"].to_numpy(dtype=float))
+
+    i = 0
+    if start_time is not None:
+        if isinstance(times.dtype, pd.DatetimeTZDtype):
+            start_time = pd.Timestamp(start_time)
+            start_time = start_time.tz_localize("UTC") if start_time.tzinfo is None else start_time
+        i = int(times.searchsorted(start_time))
+    sessions: List[SessionStats] = []
+    while i < bars.n:
+        mid = float(close[i])
+        res, stop = _run_grid(bars, i, mid, cfg)
+        end = stop if res.stopped_by_breakout else bars.n - 1
+        sessions.append(SessionStats(
+            start_index=i, end_index=end, start_time=times.iloc[i], end_time=times.iloc[end], mid=mid,
+            cycles_long=res.cycles_long, cycles_short=res.cycles_short,
+            pnl_long=res.pnl_long, pnl_short=res.pnl_short, total_pnl=res.total_pnl,
+            stopped_by_breakout=res.stopped_by_breakout,
+        ))
+        if not res.stopped_by_breakout:
+            break
+        i = stop + 1  # next session starts on the bar after the breakout
+    return sessions
@@ -1,17 +1,46 @@
+from typing import List
+
+import numpy as np
 import pandas as pd
-from binance.client import Client
+
+INTERVAL_MS = {
+    "1s": 1_000, "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000, "8h": 28_800_000,
+    "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000, "1w": 604_800_000,
+}
+
+KLINE_COLUMNS = ["open_time","open","high","low","close","volume","close_time","quote_asset_volume",
+                 "number_of_trades","taker_buy_base","taker_buy_quote","ignore"]
+
+def interval_ms(interval: str) -> int:
+    try:
+        return INTERVAL_MS[interval]
+    except KeyError:
+        raise ValueError(f"Unsupported fixed-length kline interval: {interval}") from None
+
+def to_ms(value) -> int:
+    """Epoch ms from an int (already ms), a date string or a datetime; naive values are UTC."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return ts.value // 1_000_000
+
+def klines_frame(raw: List[list]) -> pd.DataFrame:
+    """Raw Binance kline rows -> cleaned DataFrame (time, open, high, low, close, volume, close_time)."""
+    df = pd.DataFrame(raw, columns=KLINE_COLUMNS)
+    for c in ["open","high","low","close","volume","quote_asset_volume","taker_buy_base","taker_buy_quote"]:
+        df[c] = pd.to_numeric(df[c], errors="coerce")
+    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
+    df["close_time"] = pd.to_datetime(df["close_time"], unit="ms", utc=True)
+    return df[["open_time","open","high","low","close","volume","close_time"]].rename(columns={"open_time":"time"})
 
 def fetch_futures_klines(symbol: str, interval: str, start_str: str, end_str: str) -> pd.DataFrame:
     """Fetch USD-M futures klines from Binance (public). Returns a cleaned DataFrame."""
+    from binance.client import Client  # python-binance, only needed for this sequential fallback
     cli = Client(api_key=None, api_secret=None)
     raw = cli.futures_historical_klines(symbol=symbol, interval=interval, start_str=start_str, end_str=end_str)
     if not raw:
         raise ValueError(f"No klines returned for {symbol} {interval} {start_str}->{end_str}")
-    cols = ["open_time","open","high","low","close","volume","close_time","quote_asset_volume",
-            "number_of_trades","taker_buy_base","taker_buy_quote","ignore"]
-    df = pd.DataFrame(raw, columns=cols)
-    for c in ["open","high","low","close","volume","quote_asset_volume","taker_buy_base","taker_buy_quote"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-    df["open_time"] = pd.to_datetime(df["open_time"], unit="ms", utc=True)
-    df["close_time"] = pd.to_datetime(df["close_time"], unit="ms", utc=True)
-    return df[["open_time","open","high","low","close","volume","close_time"]].rename(columns={"open_time":"time"})
+    return klines_frame(raw)
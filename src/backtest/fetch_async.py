@@ -0,0 +1,164 @@
+# src/backtest/fetch_async.py
+import asyncio
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from src.backtest.fetch import interval_ms, klines_frame, to_ms
+from src.backtest.funding import FUNDING_PERIOD_MS
+
+BASE_URL = "https://fapi.binance.com"
+KLINES_PATH = "/fapi/v1/klines"
+FUNDING_PATH = "/fapi/v1/fundingRate"
+CHUNK_BARS = 1500          # max klines per request
+FUNDING_LIMIT = 1000       # max funding events per request
+KLINES_WEIGHT = 10         # request weight for 1000 < limit <= 1500
+WEIGHT_LIMIT_1M = 2400     # USD-M REQUEST_WEIGHT per minute per IP
+RETRY_STATUSES = {418, 429, 500, 502, 503, 504}
+
+log = logging.getLogger("fgrid.fetch")
+
+class WeightGate:
+    """Keeps our own estimate of the per-minute weight and syncs it with X-MBX-USED-WEIGHT-1M.
+
+    The limit is per IP, so downloads running side by side (each thread with its own event loop)
+    should share one gate; its lock is a thread lock and is never held across an await.
+    """
+
+    def __init__(self, limit: int = WEIGHT_LIMIT_1M, headroom: float = 0.8):
+        self.budget = int(limit * headroom)
+        self.used = 0
+        self.window = int(time.time() // 60)
+        self.lock = threading.Lock()
+
+    def _roll(self):
+        w = int(time.time() // 60)
+        if w != self.window:
+            self.window, self.used = w, 0
+
+    async def acquire(self, weight: int):
+        while True:
+            with self.lock:
+                self._roll()
+                if self.used + weight <= self.budget:
+                    self.used += weight
+                    return
+                used = self.used
+            wait = 60 - time.time() % 60 + 0.25
+            log.info(f"weight {used}/{self.budget} used, waiting {wait:.1f}s for the next minute")
+            await asyncio.sleep(wait)
+
+    def sync(self, headers):
+        v = headers.get("X-MBX-USED-WEIGHT-1M") or headers.get("X-MBX-USED-WEIGHT-1m")
+        if v is not None:
+            with self.lock:
+                self._roll()
+                self.used = max(self.used, int(v))
+
+def _chunks(start_ms: int, end_ms: int, iv: int, bars: int = CHUNK_BARS) -> List[Tuple[int, int]]:
+    """Interval-aligned ``(startTime, endTime)`` pairs covering ``[start_ms, end_ms]`` inclusive."""
+    first = -(-start_ms // iv) * iv
+    span = bars * iv
+    return [(a, min(a + span - 1, end_ms)) for a in range(first, end_ms + 1, span)]
+
+async def _fetch_chunk(session: aiohttp.ClientSession, url: str, params: dict, sem: asyncio.Semaphore,
+                       gate: WeightGate, retries: int, weight: int = KLINES_WEIGHT) -> list:
+    what = url.rsplit("/", 1)[-1]  # klines / fundingRate
+    for attempt in range(retries + 1):
+        await gate.acquire(weight)
+        try:
+            async with sem, session.get(url, params=params) as resp:
+                gate.sync(resp.headers)
+                if resp.status == 200:
+                    return await resp.json()
+                body = await resp.text()
+                if resp.status not in RETRY_STATUSES:
+                    raise RuntimeError(f"{what} {params} failed: HTTP {resp.status} {body}")
+                delay = float(resp.headers.get("Retry-After", 0)) or 0.5 * 2 ** attempt
+                log.warning(f"{what} HTTP {resp.status}, retry {attempt + 1}/{retries} in {delay:.1f}s")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            delay = 0.5 * 2 ** attempt
+            log.warning(f"{what} {type(e).__name__}: {e}, retry {attempt + 1}/{retries} in {delay:.1f}s")
+        if attempt < retries:
+            await asyncio.sleep(delay)
+    raise RuntimeError(f"{what} {params} failed after {retries} retries")
+
+async def fetch_klines_async(symbol: str, interval: str, start, end, base_url: str = BASE_URL,
+                             concurrency: int = 8, retries: int = 5,
+                             session: Optional[aiohttp.ClientSession] = None,
+                             gate: Optional[WeightGate] = None) -> pd.DataFrame:
+    """Download ``[start, end]`` as concurrent 1500-bar chunks. Same schema as ``fetch_futures_klines``.
+    Pass ``gate`` to share the weight budget with other downloads running at the same time."""
+    start_ms, end_ms = to_ms(start), to_ms(end)
+    chunks = _chunks(start_ms, end_ms, interval_ms(interval))
+    sem = asyncio.Semaphore(concurrency)
+    gate = gate or WeightGate()
+    url = base_url.rstrip("/") + KLINES_PATH
+
+    own = session is None
+    if own:
+        session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    try:
+        pages = await asyncio.gather(*[
+            _fetch_chunk(session, url, {"symbol": symbol, "interval": interval, "startTime": a,
+                                        "endTime": b, "limit": CHUNK_BARS}, sem, gate, retries)
+            for a, b in chunks
+        ])
+    finally:
+        if own:
+            await session.close()
+
+    raw, last = [], None
+    for page in pages:
+        for row in page:
+            if last is None or row[0] > last:
+                raw.append(row)
+                last = row[0]
+    if not raw:
+        raise ValueError(f"No klines returned for {symbol} {interval} {start}->{end}")
+    return klines_frame(raw)
+
+def fetch_futures_klines_concurrent(symbol: str, interval: str, start_str, end_str, **kwargs) -> pd.DataFrame:
+    """Blocking wrapper around ``fetch_klines_async`` with the ``fetch_futures_klines`` signature."""
+    return asyncio.run(fetch_klines_async(symbol, interval, start_str, end_str, **kwargs))
+
+async def _fetch_funding_window(session: aiohttp.ClientSession, url: str, symbol: str, a: int, b: int,
+                                sem: asyncio.Semaphore, gate: WeightGate, retries: int) -> list:
+    """All funding events in ``[a, b]``: a full page means there may be more, so continue after its last one."""
+    out = []
+    while a <= b:
+        page = await _fetch_chunk(session, url, {"symbol": symbol, "startTime": a, "endTime": b,
+                                                 "limit": FUNDING_LIMIT}, sem, gate, retries, weight=1)
+        out.extend(page)
+        if len(page) < FUNDING_LIMIT:
+            break
+        a = int(page[-1]["fundingTime"]) + 1
+    return out
+
+async def fetch_funding_async(symbol: str, start, end, base_url: str = BASE_URL, concurrency: int = 4,
+                              retries: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """Funding events in ``[start, end]`` as ``(fundingTime ms, fundingRate)`` arrays. Windows of 500
+    nominal 8h periods are fetched concurrently; a window that fills a page (symbols funding every 1-4h)
+    is paged through from its last event."""
+    start_ms, end_ms = to_ms(start), to_ms(end)
+    span = FUNDING_LIMIT * FUNDING_PERIOD_MS // 2
+    windows = [(a, min(a + span - 1, end_ms)) for a in range(start_ms, end_ms + 1, span)]
+    sem = asyncio.Semaphore(concurrency)
+    gate = WeightGate()
+    url = base_url.rstrip("/") + FUNDING_PATH
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+        pages = await asyncio.gather(*[
+            _fetch_funding_window(session, url, symbol, a, b, sem, gate, retries) for a, b in windows
+        ])
+    rows = {int(r["fundingTime"]): float(r["fundingRate"]) for page in pages for r in page}
+    times = np.array(sorted(rows), dtype=np.int64)
+    return times, np.array([rows[t] for t in times.tolist()], dtype=np.float64)
+
+def fetch_funding_rates(symbol: str, start, end, **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+    """Blocking wrapper around ``fetch_funding_async``."""
+    return asyncio.run(fetch_funding_async(symbol, start, end, **kwargs))
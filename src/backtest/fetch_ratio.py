@@ -1,78 +1,85 @@
 # src/backtest/fetch_ratio.py
-import pandas as pd
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import List, Optional, Sequence, Tuple
+
 import numpy as np
-from pandas.api.types import is_datetime64_any_dtype, is_datetime64tz_dtype
-from src.backtest.fetch import fetch_futures_klines
+import pandas as pd
+
+from src.backtest.fetch import interval_ms, to_ms
+from src.backtest.fetch_async import WeightGate, fetch_futures_klines_concurrent
+from src.backtest.store import KlineStore
 
-def _normalize(df: pd.DataFrame) -> pd.DataFrame:
-    if df is None or len(df) == 0:
-        raise ValueError("Empty dataframe from fetch_futures_klines")
-    df = df.copy()
+log = logging.getLogger("fgrid.ratio")
 
-    # Find time column
-    time_candidates = ["open_time","openTime","timestamp","time","t","open_time_ms"]
-    ts_col = next((c for c in time_candidates if c in df.columns), None)
-    if ts_col is None:
-        if df.index.name in time_candidates:
-            df = df.reset_index()
-            ts_col = df.columns[0]
-        else:
-            # fallback: first column if it looks time-ish
-            first = df.columns[0]
-            if "time" in first.lower():
-                ts_col = first
-            else:
-                raise KeyError("No suitable time column found in klines dataframe")
+@dataclass
+class LegPanel:
+    """Klines of several symbols aligned on one shared open-time grid.
 
-    ts = df[ts_col]
+    ``high``/``low``/``close`` are (legs, bars) arrays, NaN where a leg has no candle, so any
+    leg's row is a plain view and a ratio is one vectorized division per column.
+    """
+    symbols: List[str]
+    time: np.ndarray   # int64 open_time ms, every ``interval`` from the first bar
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
 
-    # Normalize to integer milliseconds in column "ts"
-    if is_datetime64tz_dtype(ts) or (is_datetime64_any_dtype(ts) and getattr(ts.dt, 'tz', None) is not None):
-        # timezone-aware -> drop tz then cast to ns -> ms
-        df["ts"] = (ts.dt.tz_convert(None).astype("int64") // 1_000_000).astype("int64")
-    elif is_datetime64_any_dtype(ts):
-        # tz-naive datetime64[ns]
-        df["ts"] = (ts.astype("int64") // 1_000_000).astype("int64")
-    else:
-        # numeric/strings -> coerce, then detect sec vs ms
-        ts_num = pd.to_numeric(ts, errors="coerce")
-        if ts_num.dropna().median() < 10_000_000_000:  # looks like seconds
-            ts_num = (ts_num * 1000).astype("int64")
-        df["ts"] = ts_num.astype("int64")
+    def row(self, symbol: str) -> int:
+        return self.symbols.index(symbol.upper())
 
-    # Pick OHLC
-    def pick(*cands):
-        for c in cands:
-            if c in df.columns:
-                return c
-            lc = c.lower()
-            for col in df.columns:
-                if col.lower() == lc:
-                    return col
-        return None
+    def ratio(self, base: str, quote: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(low, high, close)`` of base/quote. The bounds are the widest the ratio can reach
+        within the bar (low/high of base over high/low of quote), not ``close`` repeated."""
+        a, b = self.row(base), self.row(quote)
+        return self.low[a] / self.high[b], self.high[a] / self.low[b], self.close[a] / self.close[b]
 
-    close_col = pick("close","c")
-    high_col  = pick("high","h") or close_col
-    low_col   = pick("low","l")  or close_col
-    if close_col is None:
-        raise KeyError("close column not found in klines dataframe")
+def load_panel(symbols: Sequence[str], interval: str, start, end, data_dir: Optional[str] = None,
+               workers: int = 4) -> LegPanel:
+    """Bring every leg's ``[start, end]`` into the kline store concurrently, then align the
+    memory-mapped columns once by open time. Legs that fail to download are logged and left out."""
+    # The weight limit is per IP: every leg's download draws on one shared budget
+    store = KlineStore(data_dir, partial(fetch_futures_klines_concurrent, gate=WeightGate()))
+    start_ms, end_ms = to_ms(start), to_ms(end) + 1
+    symbols = [s.upper() for s in symbols]
+    ok = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futures = {s: ex.submit(store.update, s, interval, start_ms, end_ms) for s in symbols}
+        for s, f in futures.items():
+            try:
+                f.result()
+                ok.append(s)
+            except Exception as e:
+                log.warning(f"{s} {interval} left out: {e}")
 
-    out = pd.DataFrame({
-        "ts":   df["ts"].values,
-        "close": pd.to_numeric(df[close_col], errors="coerce").values,
-        "high":  pd.to_numeric(df[high_col],  errors="coerce").values,
-        "low":   pd.to_numeric(df[low_col],   errors="coerce").values,
-    }).dropna(subset=["ts","close"]).drop_duplicates(subset=["ts"]).sort_values("ts").reset_index(drop=True)
-    return out
+    cols = {s: store.arrays(s, interval, start_ms, end_ms) for s in ok}
+    ok = [s for s in ok if len(cols[s]["open_time"])]
+    if not ok:
+        raise ValueError(f"No klines for any of {symbols} {interval} {start}->{end}")
+    iv = interval_ms(interval)
+    t0 = min(int(cols[s]["open_time"][0]) for s in ok)
+    n = (max(int(cols[s]["open_time"][-1]) for s in ok) - t0) // iv + 1
+    high, low, close = (np.full((len(ok), n), np.nan) for _ in range(3))
+    for k, s in enumerate(ok):
+        c = cols[s]
+        pos = (np.asarray(c["open_time"]) - t0) // iv
+        high[k, pos] = c["high"]
+        low[k, pos] = c["low"]
+        close[k, pos] = c["close"]
+    return LegPanel(ok, t0 + iv * np.arange(n, dtype=np.int64), high, low, close)
 
-def fetch_ratio_klines(start, end, interval="1m"):
-    btc = _normalize(fetch_futures_klines("BTCUSDT", interval, start, end))
-    eth = _normalize(fetch_futures_klines("ETHUSDT", interval, start, end))
-    df = pd.merge(btc, eth, on="ts", how="inner", suffixes=("_btc","_eth"))
-    ratio = df["close_btc"] / df["close_eth"]
+def fetch_ratio_klines(start, end, interval="1m", data_dir=None, base="BTCUSDT", quote="ETHUSDT"):
+    """base/quote ratio candles (``time``, ``low``, ``high``, ``close``) on the bars both legs have."""
+    panel = load_panel([base, quote], interval, start, end, data_dir=data_dir, workers=2)
+    if len(panel.symbols) < 2:
+        raise ValueError(f"Missing klines for {base} or {quote}")
+    low, high, close = panel.ratio(base, quote)
+    keep = ~np.isnan(close)
     return pd.DataFrame({
-        "time": df["ts"],  # align with backtest engine expectations
-        "close": ratio,
-        "low":   ratio,
-        "high":  ratio,
+        "time": pd.to_datetime(panel.time[keep], unit="ms", utc=True),
+        "close": close[keep],
+        "low": low[keep],
+        "high": high[keep],
     })
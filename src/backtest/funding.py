@@ -0,0 +1,28 @@
+# src/backtest/funding.py
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+FUNDING_PERIOD_MS = 8 * 3_600_000
+
+@dataclass
+class FundingHistory:
+    """Funding events of one symbol: settlement times (int64 epoch ms, ascending) and the rate
+    charged at each (positive: longs pay shorts)."""
+    time: np.ndarray
+    rate: np.ndarray
+
+    def between(self, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Events with ``lo < time <= hi``."""
+        i, j = np.searchsorted(self.time, [lo, hi], side="right")
+        return self.time[i:j], self.rate[i:j]
+
+@dataclass
+class FlatFunding:
+    """Fallback without history: ``bps_8h`` basis points at every 00/08/16 UTC settlement."""
+    bps_8h: float
+
+    def between(self, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+        times = np.arange((lo // FUNDING_PERIOD_MS + 1) * FUNDING_PERIOD_MS, hi + 1, FUNDING_PERIOD_MS, dtype=np.int64)
+        return times, np.full(len(times), self.bps_8h / 1e4)
@@ -0,0 +1,179 @@
+# src/backtest/montecarlo.py
+import argparse
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.engine import BacktestConfig, PathResults, backtest_paths
+from src.backtest.fetch import interval_ms
+from src.backtest.store import load_futures_klines
+from src.bot.exchange.filters import public_symbol_filters
+
+# Rough peak bytes per path and bar: log moves, low/high and the engine's sanitized copies (float64)
+_BYTES_PER_BAR = 64
+
+@dataclass
+class BlockBootstrap:
+    """Resample history in contiguous blocks of bars, keeping intrabar ranges and short-range
+    autocorrelation. Each bar is stored relative to the previous close as log moves."""
+    ret: np.ndarray    # log(close / prev close)
+    up: np.ndarray     # log(high / prev close)
+    down: np.ndarray   # log(low / prev close)
+    block: int = 1440
+
+    @classmethod
+    def from_klines(cls, df: pd.DataFrame, block: int = 1440) -> "BlockBootstrap":
+        df = df.sort_values("time")
+        c, h, l = (df[k].to_numpy(dtype=float) for k in ("close", "high", "low"))
+        prev = c[:-1]
+        ret, up, down = np.log(c[1:] / prev), np.log(h[1:] / prev), np.log(l[1:] / prev)
+        ok = np.isfinite(ret) & np.isfinite(up) & np.isfinite(down)
+        if ok.sum() < block:
+            raise ValueError(f"Need at least {block} complete bars to bootstrap, got {int(ok.sum())}")
+        return cls(ret[ok], up[ok], down[ok], block)
+
+    def log_moves(self, n_paths: int, n_bars: int, rng: np.random.Generator):
+        n_blocks = -(-n_bars // self.block)
+        starts = rng.integers(0, len(self.ret) - self.block + 1, size=(n_paths, n_blocks))
+        idx = (starts[:, :, None] + np.arange(self.block)).reshape(n_paths, -1)[:, :n_bars]
+        return self.ret[idx], self.up[idx], self.down[idx]
+
+@dataclass
+class JumpGBM:
+    """Geometric Brownian motion per bar plus optional normal jumps. The intrabar high/low are the
+    exact extremes of a Brownian bridge from the previous close to the close."""
+    sigma: float             # stdev of the per-bar diffusive log return
+    drift: float = 0.0       # mean per-bar log return
+    jump_prob: float = 0.0   # chance of a jump in a bar
+    jump_sigma: float = 0.0  # stdev of the jump's log size
+
+    @classmethod
+    def from_klines(cls, df: pd.DataFrame, **kw) -> "JumpGBM":
+        c = df.sort_values("time")["close"].to_numpy(dtype=float)
+        r = np.diff(np.log(c))
+        return cls(sigma=float(np.nanstd(r)), **kw)
+
+    def log_moves(self, n_paths: int, n_bars: int, rng: np.random.Generator):
+        shape = (n_paths, n_bars)
+        ret = rng.normal(self.drift, self.sigma, shape)
+        if self.jump_prob > 0:
+            ret += np.where(rng.random(shape) < self.jump_prob, rng.normal(0.0, self.jump_sigma, shape), 0.0)
+        var2 = 2 * self.sigma ** 2
+        up = (ret + np.sqrt(ret ** 2 - var2 * np.log(1.0 - rng.random(shape)))) / 2
+        down = (ret - np.sqrt(ret ** 2 - var2 * np.log(1.0 - rng.random(shape)))) / 2
+        return ret, up, down
+
+def ohlc_paths(model, start: float, n_paths: int, n_bars: int,
+               rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """(paths, bars) low/high arrays of ``model`` paths starting from the close ``start``."""
+    ret, up, down = model.log_moves(n_paths, n_bars, rng)
+    prev = np.cumsum(ret, axis=1)
+    prev -= ret                      # log(prev close / start)
+    up += prev
+    down += prev
+    return start * np.exp(down), start * np.exp(up)
+
+def batch_size(n_bars: int, mem_mb: float) -> int:
+    return max(1, int(mem_mb * 2**20) // (_BYTES_PER_BAR * n_bars))
+
+def iter_path_batches(model, start: float, n_paths: int, n_bars: int, seed: int = 0,
+                      mem_mb: float = 1024) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Yield (low, high) batches totalling ``n_paths`` rows. The same seed and ``mem_mb`` give the same paths."""
+    rng = np.random.default_rng(seed)
+    size = batch_size(n_bars, mem_mb)
+    for i in range(0, n_paths, size):
+        yield ohlc_paths(model, start, min(size, n_paths - i), n_bars, rng)
+
+def monte_carlo(model, mid: float, cfg: BacktestConfig, n_paths: int, n_bars: int, seed: int = 0,
+                mem_mb: float = 1024) -> PathResults:
+    """Run ``cfg``'s grid centred on ``mid`` over ``n_paths`` synthetic paths of ``n_bars`` bars,
+    a memory-bounded batch at a time. Row ``i`` of the result is path ``i``."""
+    parts = [backtest_paths(low, high, mid, cfg)
+             for low, high in iter_path_batches(model, mid, n_paths, n_bars, seed, mem_mb)]
+    return PathResults(**{f.name: np.concatenate([getattr(p, f.name) for p in parts]) for f in fields(PathResults)})
+
+def summarize(res: PathResults, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)) -> Dict[str, Dict[str, float]]:
+    """Mean and quantiles of total PnL, cycles and (over paths that broke out) the breakout bar."""
+    broke = res.breakout_bar >= 0
+    series = {"total_pnl": res.total_pnl, "cycles": res.cycles_long + res.cycles_short,
+              "breakout_bar": res.breakout_bar[broke]}
+    out = {}
+    for name, v in series.items():
+        row = {"mean": float(v.mean()) if v.size else float("nan")}
+        row.update({f"p{round(q * 100)}": float(np.quantile(v, q)) if v.size else float("nan") for q in quantiles})
+        out[name] = row
+    out["breakout"] = {"share": float(broke.mean())}
+    return out
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Monte-Carlo robustness of the both-sides grid on synthetic paths")
+    ap.add_argument("--symbol", default="BTCUSDT")
+    ap.add_argument("--interval", default="1m")
+    ap.add_argument("--data-dir", default=None)
+    ap.add_argument("--start", help="history to bootstrap from / fit sigma on")
+    ap.add_argument("--end")
+    ap.add_argument("--model", choices=("bootstrap", "gbm"), default="bootstrap")
+    ap.add_argument("--block-bars", type=int, default=1440, help="bootstrap block length")
+    ap.add_argument("--sigma", type=float, default=None, help="gbm per-bar log-return stdev (default: fit on history)")
+    ap.add_argument("--drift", type=float, default=0.0, help="gbm per-bar mean log return")
+    ap.add_argument("--jump-prob", type=float, default=0.0, help="gbm jump chance per bar")
+    ap.add_argument("--jump-sigma", type=float, default=0.0, help="gbm jump log-size stdev")
+    ap.add_argument("--mid", type=float, default=None, help="start price (default: last close of the history)")
+    ap.add_argument("--paths", type=int, default=10_000)
+    ap.add_argument("--bars", type=int, default=43_200, help="bars per path (43200 = 30 days of 1m)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--mem-mb", type=float, default=1024, help="memory budget per batch of paths")
+    ap.add_argument("--levels", type=int, default=20)
+    ap.add_argument("--step-pct", type=float, default=0.25)
+    ap.add_argument("--tp-pct", type=float, default=0.20)
+    ap.add_argument("--order-usdt", type=float, default=20.0)
+    ap.add_argument("--max-range-pct", type=float, default=4.0)
+    ap.add_argument("--effective-exposure", type=float, default=1.2)
+    ap.add_argument("--exchange-filters", action="store_true",
+                    help="round grid prices/qty to the symbol's tick/lot size like the live bot")
+    ap.add_argument("--out", default=None, help="optional per-path CSV")
+    return ap.parse_args()
+
+def main():
+    a = parse_args()
+    df: Optional[pd.DataFrame] = None
+    if a.model == "bootstrap" or a.sigma is None or a.mid is None:
+        if not (a.start and a.end):
+            raise SystemExit("--start/--end are needed to bootstrap, fit --sigma or pick --mid")
+        df = load_futures_klines(a.symbol, a.interval, a.start, a.end, data_dir=a.data_dir)
+    if a.model == "bootstrap":
+        model = BlockBootstrap.from_klines(df, a.block_bars)
+    elif a.sigma is None:
+        model = JumpGBM.from_klines(df, drift=a.drift, jump_prob=a.jump_prob, jump_sigma=a.jump_sigma)
+    else:
+        model = JumpGBM(a.sigma, a.drift, a.jump_prob, a.jump_sigma)
+    mid = a.mid if a.mid is not None else float(df.sort_values("time")["close"].iloc[-1])
+
+    cfg = BacktestConfig(symbol=a.symbol, levels=a.levels, step_pct=a.step_pct, tp_pct=a.tp_pct,
+                         order_usdt=a.order_usdt, effective_exposure=a.effective_exposure,
+                         max_range_pct=a.max_range_pct,
+                         filters=public_symbol_filters(a.symbol) if a.exchange_filters else None)
+    print(f"Simulating {a.paths} {a.model} paths x {a.bars} bars from {mid} "
+          f"({batch_size(a.bars, a.mem_mb)} paths per batch)")
+    t0 = time.time()
+    res = monte_carlo(model, mid, cfg, a.paths, a.bars, seed=a.seed, mem_mb=a.mem_mb)
+    dt = time.time() - t0
+    if a.out:
+        pd.DataFrame(asdict(res)).to_csv(a.out, index_label="path")
+
+    bar_h = interval_ms(a.interval) / 3_600_000
+    s = summarize(res)
+    print(f"=== MONTE-CARLO ({a.paths} paths in {dt:.1f}s) ===")
+    print(f"{'':16}{'mean':>12}{'p5':>12}{'p25':>12}{'p50':>12}{'p75':>12}{'p95':>12}")
+    for name, label, scale in (("total_pnl", "PnL (USDT)", 1.0), ("cycles", "Cycles", 1.0),
+                               ("breakout_bar", "Breakout (h)", bar_h)):
+        print(f"{label:16}" + "".join(f"{v * scale:>12.2f}" for v in s[name].values()))
+    print(f"Broke out within {a.bars} bars: {s['breakout']['share']:.1%} of paths")
+    if a.out:
+        print(f"Per-path results -> {a.out}")
+
+if __name__ == "__main__":
+    main()
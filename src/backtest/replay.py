@@ -0,0 +1,210 @@
+# src/backtest/replay.py
+import argparse
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from src.backtest.engine import BacktestConfig, backtest
+from src.backtest.sim import SimExchange, VirtualClock
+from src.backtest.store import load_futures_klines
+from src.bot.exchange.binance import BinanceUM
+from src.bot.exchange.filters import SymbolFilters, public_symbol_filters
+from src.bot.exchange.ratelimit import WeightBudget
+from src.bot.main import close_grid, deploy_grid, guard_fill_price, guard_prices, make_tracker
+from src.bot.utils.config import Settings
+
+@dataclass
+class ReplayResult:
+    bars: int
+    fills: int
+    rejects: int
+    cycles_long: int          # reduce-only SELL fills (long TPs)
+    cycles_short: int         # reduce-only BUY fills (short TPs)
+    pnl_long: float           # realized by SELL fills closing longs
+    pnl_short: float          # realized by BUY fills closing shorts
+    realized_pnl: float
+    position: float           # net position left at the end
+    unrealized_pnl: float     # of that position at the last price
+    stopped_by_breakout: bool
+    breakout_source: str      # "client", "exchange" or ""
+    rest_calls: int
+    rate_limit_waits: int
+    virtual_sec: float
+    wall_sec: float
+
+def _path(o: float, h: float, l: float, c: float):
+    # Intrabar order is unknown: assume the nearer extreme comes first (down bars touch the high first)
+    return (o, l, h, c) if c >= o else (o, h, l, c)
+
+def replay(df: pd.DataFrame, cfg: Settings, filters: SymbolFilters, speed: float = 0.0, log=None) -> ReplayResult:
+    """Run the live bot's own code (deploy_grid, FillTracker, guard, close_grid) against a
+    simulated exchange that replays ``df`` bar by bar on a virtual clock.
+
+    The grid is deployed at the first bar's close; every later bar moves the market along
+    open -> low/high -> close. User-data events are applied synchronously after each move.
+    See ``differences`` for what still differs from ``backtest()``.
+    """
+    log = log or logging.getLogger("fgrid.replay")
+    df = df.sort_values("time").reset_index(drop=True)
+    if len(df) < 2:
+        raise ValueError(f"Need at least two candles to replay {cfg.symbol}")
+    ts = (df["time"] - pd.Timestamp(0, tz="UTC")).dt.total_seconds().to_numpy()
+    o, h, l, c = (df[k].to_numpy(dtype=float) for k in ("open", "high", "low", "close"))
+
+    t0 = time.time()
+    clock = VirtualClock(ts[0], speed)
+    sim = SimExchange(cfg.symbol, filters, clock, price=float(c[0]))
+    with tempfile.TemporaryDirectory(prefix="fgrid-replay-") as tmp:
+        cfg = cfg.model_copy(update={"dry_run": False, "warm_restart": False,
+                                     "state_file": os.path.join(tmp, "grid.json")})
+        um = BinanceUM("", "", budget=WeightBudget(cfg.rate_limit_headroom, clock=clock), client=sim)
+        um.filters_cache.path = Path(tmp) / "exchange_info.json"
+        um.set_isolated(cfg.symbol, cfg.isolated)
+        um.set_leverage(cfg.symbol, leverage=1)
+        snap = deploy_grid(um, cfg, log)
+        low, high = guard_prices(cfg, snap.mid)
+
+        guard_hits = []
+        tracker = None
+        if cfg.track_fills or snap.guard_ids:
+            tracker = make_tracker(um, cfg, snap, on_guard=lambda ev: guard_hits.append(guard_fill_price(ev)))
+
+        stats = {"cycles_long": 0, "cycles_short": 0, "pnl_long": 0.0, "pnl_short": 0.0}
+
+        def drain():
+            while sim.events:
+                ev = sim.events.popleft()
+                e = ev.get("o", {})
+                if e.get("X") == "FILLED":
+                    book = "long" if e["S"] == "SELL" else "short"
+                    stats[f"pnl_{book}"] += float(e["rp"])
+                    if e["R"] and e["o"] == "LIMIT":
+                        stats[f"cycles_{book}"] += 1
+                if tracker is not None:
+                    todo = tracker.handle(ev)
+                    if todo:
+                        tracker.place(todo)
+
+        drain()
+        source, bars = "", 0
+        for i in range(1, len(df)):
+            clock.advance_to(ts[i])
+            bars += 1
+            for p in _path(o[i], h[i], l[i], c[i]):
+                sim.move_to(p)
+                drain()
+                if guard_hits:
+                    source, price = "exchange", guard_hits[0]
+                elif p < low or p > high:
+                    source, price = "client", p
+                else:
+                    continue
+                close_grid(um, cfg, snap, price, source, log)
+                tracker = None
+                drain()
+                break
+            if source:
+                break
+
+    return ReplayResult(
+        bars=bars,
+        fills=sim.fills,
+        rejects=sim.rejects,
+        realized_pnl=sim.realized,
+        position=sim.position,
+        unrealized_pnl=float(sim.unrealized()),
+        stopped_by_breakout=bool(source),
+        breakout_source=source,
+        rest_calls=sum(sim.calls.values()),
+        rate_limit_waits=um.budget.waits,
+        virtual_sec=float(clock.time() - ts[0]),
+        wall_sec=time.time() - t0,
+        **stats,
+    )
+
+def differences(cfg: Settings) -> list:
+    """Where a replay of ``cfg`` still runs different semantics from ``backtest()``."""
+    out = ["one-way account: long and short books net into one position (backtest keeps them apart)",
+           "startup TPs are reduce-only and get rejected until an entry fills; the tracker places them then",
+           "fills happen on touch along open -> low/high -> close, one path price at a time",
+           "breakout is checked inline on every path price, not through run_live/watch_breakout polling"]
+    if not cfg.track_fills:
+        out.append("TRACK_FILLS=false: no TP is placed after an entry fills, so no cycles close")
+    elif cfg.rearm_entries:
+        out.append("REARM_ENTRIES=true: entries are placed again after their TP fills (backtest trades each level once)")
+    return out
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Replay candles through the live bot on a simulated exchange")
+    ap.add_argument("--symbol", default="BTCUSDT")
+    ap.add_argument("--interval", default="1m")
+    ap.add_argument("--data-dir", default=None, help="local kline store (default: $FGRID_DATA_DIR or ./data)")
+    ap.add_argument("--start", required=True)
+    ap.add_argument("--end", required=True)
+    ap.add_argument("--levels", type=int, default=20)
+    ap.add_argument("--step-pct", type=float, default=0.25)
+    ap.add_argument("--tp-pct", type=float, default=0.20)
+    ap.add_argument("--order-usdt", type=float, default=20.0)
+    ap.add_argument("--max-range-pct", type=float, default=4.0)
+    ap.add_argument("--effective-exposure", type=float, default=1.2)
+    ap.add_argument("--no-track-fills", action="store_true", help="replay with TRACK_FILLS=false")
+    ap.add_argument("--rearm-entries", action="store_true",
+                    help="replay with REARM_ENTRIES=true, as live runs (default: each level trades once, as the backtest)")
+    ap.add_argument("--exchange-guard", action="store_true", help="replay with EXCHANGE_GUARD=true")
+    ap.add_argument("--tick-size", type=float, default=None,
+                    help="with --lot-size: use these filters instead of fetching exchange_info")
+    ap.add_argument("--lot-size", type=float, default=None)
+    ap.add_argument("--speed", type=float, default=0.0,
+                    help="pace the replay at N x wall clock (0 = as fast as possible)")
+    ap.add_argument("--verbose", action="store_true", help="show the bot's own log lines")
+    return ap.parse_args()
+
+def main():
+    a = parse_args()
+    logging.basicConfig(level=logging.INFO if a.verbose else logging.WARNING,
+                        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    df = load_futures_klines(a.symbol, a.interval, a.start, a.end, data_dir=a.data_dir)
+    if a.tick_size and a.lot_size:
+        filters = SymbolFilters(a.symbol, tick=a.tick_size, step=a.lot_size, min_qty=a.lot_size)
+    else:
+        filters = public_symbol_filters(a.symbol)
+    cfg = Settings(api_key="sim", api_secret="sim", symbol=a.symbol, grid_levels=a.levels, step_pct=a.step_pct,
+                   tp_pct=a.tp_pct, order_usdt=a.order_usdt, max_range_pct=a.max_range_pct,
+                   effective_exposure=a.effective_exposure, track_fills=not a.no_track_fills,
+                   rearm_entries=a.rearm_entries, exchange_guard=a.exchange_guard, dry_run=False)
+    cfg.validate()
+
+    res = replay(df, cfg, filters, speed=a.speed)
+    bt = backtest(df, BacktestConfig(symbol=a.symbol, levels=a.levels, step_pct=a.step_pct, tp_pct=a.tp_pct,
+                                     order_usdt=a.order_usdt, effective_exposure=a.effective_exposure,
+                                     max_range_pct=a.max_range_pct, filters=filters), engine="numpy")
+
+    print("=== LIVE-BOT REPLAY vs BACKTEST ===")
+    print(f"Symbol:            {a.symbol}  {a.interval}  {a.start} -> {a.end}")
+    print(f"Replayed:          {res.bars} bars, {res.virtual_sec / 86400:.1f} days in {res.wall_sec:.1f}s wall "
+          f"({res.virtual_sec / max(res.wall_sec, 1e-9):.0f}x)")
+    print(f"TRACK_FILLS / REARM_ENTRIES / EXCHANGE_GUARD: {cfg.track_fills} / {cfg.rearm_entries} / "
+          f"{cfg.exchange_guard}")
+    print(f"{'':22}{'replay':>16}{'backtest':>16}")
+    print(f"{'Bars':22}{res.bars:>16}{bt.bars:>16}")
+    print(f"{'Cycles long':22}{res.cycles_long:>16}{bt.cycles_long:>16}")
+    print(f"{'Cycles short':22}{res.cycles_short:>16}{bt.cycles_short:>16}")
+    print(f"{'PnL long':22}{res.pnl_long:>16.4f}{bt.pnl_long:>16.4f}")
+    print(f"{'PnL short':22}{res.pnl_short:>16.4f}{bt.pnl_short:>16.4f}")
+    print(f"{'Realized PnL':22}{res.realized_pnl:>16.4f}{bt.total_pnl:>16.4f}")
+    print(f"{'Stopped by breakout':22}{str(res.stopped_by_breakout):>16}{str(bt.stopped_by_breakout):>16}")
+    print(f"Breakout seen by:     {res.breakout_source or '-'}")
+    print(f"Open position at end: {res.position} (unrealized {res.unrealized_pnl:.4f} USDT)")
+    print(f"Fills / rejects:      {res.fills} / {res.rejects}")
+    print(f"REST calls:           {res.rest_calls}  (rate-limit waits: {res.rate_limit_waits})")
+    print("Semantics that differ from the backtest:")
+    for d in differences(cfg):
+        print(f"  - {d}")
+
+if __name__ == "__main__":
+    main()
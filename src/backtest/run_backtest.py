@@ -1,11 +1,17 @@
 import argparse
-from src.backtest.fetch import fetch_futures_klines
-from src.backtest.engine import BacktestConfig, backtest
+import logging
+from src.backtest.store import iter_futures_klines, load_funding, load_futures_klines
+from src.backtest.cache import DEFAULT_CACHE_MB, ResultCache
+from src.backtest.engine import BacktestConfig, backtest, backtest_chunks
+from src.bot.exchange.filters import public_symbol_filters
+
+log = logging.getLogger("fgrid.backtest")
 
 def parse_args():
     ap = argparse.ArgumentParser(description="Both-sides Binance Futures grid backtester")
     ap.add_argument("--symbol", default="BTCUSDT")
     ap.add_argument("--interval", default="1m")
+    ap.add_argument("--data-dir", default=None, help="local kline store (default: $FGRID_DATA_DIR or ./data)")
     ap.add_argument("--start", required=True, help="e.g., 2024-01-01")
     ap.add_argument("--end", required=True, help="e.g., 2024-06-01")
     ap.add_argument("--levels", type=int, default=20)
@@ -14,12 +20,38 @@ def parse_args():
     ap.add_argument("--order-usdt", type=float, default=20.0)
     ap.add_argument("--max-range-pct", type=float, default=4.0)
     ap.add_argument("--effective-exposure", type=float, default=1.2)
-    ap.add_argument("--funding-bps-8h", type=float, default=0.0)
+    ap.add_argument("--exchange-filters", action="store_true",
+                    help="round grid prices/qty to the symbol's tick/lot size like the live bot")
+    ap.add_argument("--funding-bps-8h", type=float, default=0.0,
+                    help="flat funding rate, used only when the funding history is unavailable or disabled")
+    ap.add_argument("--no-funding-history", action="store_true",
+                    help="do not download/read the symbol's funding history (data/funding/<SYMBOL>)")
+    ap.add_argument("--engine", choices=["loop", "numpy"], default="numpy",
+                    help="numpy = vectorized fills (same result), loop = bar-by-bar reference")
+    ap.add_argument("--chunk-bars", type=int, default=0,
+                    help="stream the candles from the store in chunks of this many bars (bounded memory)")
+    ap.add_argument("--series", default=None,
+                    help="write per-bar equity, open long/short qty and drawdown (float32 .npy columns) to this dir")
+    ap.add_argument("--no-cache", action="store_true", help="always recompute instead of reusing a cached result")
+    ap.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="size bound of the result cache")
     return ap.parse_args()
 
+def funding_history(args):
+    if args.no_funding_history:
+        return None
+    try:
+        hist = load_funding(args.symbol, args.start, args.end, data_dir=args.data_dir)
+    except Exception as e:
+        log.warning(f"Funding history unavailable ({e}); using --funding-bps-8h={args.funding_bps_8h}")
+        return None
+    if not len(hist.time):
+        log.warning(f"No funding events for {args.symbol}; using --funding-bps-8h={args.funding_bps_8h}")
+        return None
+    return hist
+
 def main():
     args = parse_args()
-    df = fetch_futures_klines(args.symbol, args.interval, args.start, args.end)
+    funding = funding_history(args)
     cfg = BacktestConfig(
         symbol=args.symbol,
         levels=args.levels,
@@ -29,8 +61,17 @@ def main():
         effective_exposure=args.effective_exposure,
         max_range_pct=args.max_range_pct,
         funding_bps_8h=args.funding_bps_8h,
+        funding=funding,
+        filters=public_symbol_filters(args.symbol) if args.exchange_filters else None,
     )
-    res = backtest(df, cfg)
+    if args.chunk_bars:
+        res = backtest_chunks(iter_futures_klines(args.symbol, args.interval, args.start, args.end,
+                                                  chunk_bars=args.chunk_bars, data_dir=args.data_dir), cfg,
+                              series=args.series)
+    else:
+        df = load_futures_klines(args.symbol, args.interval, args.start, args.end, data_dir=args.data_dir)
+        cache = None if args.no_cache else ResultCache(args.data_dir and f"{args.data_dir}/results", args.cache_mb)
+        res = backtest(df, cfg, engine=args.engine, series=args.series, cache=cache)
     print("=== BOTH-SIDES GRID BACKTEST ===")
     print(f"Symbol:            {args.symbol}")
     print(f"Interval:          {args.interval}")
@@ -41,9 +82,16 @@ def main():
     print(f"Max range %:       {args.max_range_pct}")
     print(f"Cycles (long/short): {res.cycles_long} / {res.cycles_short}")
     print(f"PnL     (long/short): {res.pnl_long:.4f} / {res.pnl_short:.4f} USDT")
+    print(f"Funding (long/short): {res.funding_long:.4f} / {res.funding_short:.4f} USDT  "
+          f"({'history' if funding is not None else f'flat {args.funding_bps_8h} bps/8h'})")
     print(f"TOTAL PnL:            {res.total_pnl:.4f} USDT")
-    print(f"Winrate (cycles):     {res.winrate:.2f}%")
+    print(f"Unrealized at end:    {res.unrealized_pnl:.4f} USDT")
+    print(f"Winrate (trips):      {res.winrate:.2f}%")
+    print(f"Max drawdown:         {res.max_drawdown:.4f} USDT  (longest under water: {res.max_under_water_bars} bars)")
+    print(f"Peak exposure:        {res.peak_exposure:.2f} USDT notional")
     print(f"Stopped by breakout:  {res.stopped_by_breakout}")
+    if args.series:
+        print(f"Per-bar series:       {args.series}")
 
 if __name__ == "__main__":
     main()
@@ -4,19 +4,23 @@ from src.backtest.fetch_ratio import fetch_ratio_klines
 
 def main():
     ap = argparse.ArgumentParser()
+    ap.add_argument("--base", default="BTCUSDT")
+    ap.add_argument("--quote", default="ETHUSDT")
     ap.add_argument("--start")
     ap.add_argument("--end")
     ap.add_argument("--interval", default="1m")
+    ap.add_argument("--data-dir", default=None)
     ap.add_argument("--levels", type=int)
     ap.add_argument("--step-pct", type=float)
     ap.add_argument("--tp-pct", type=float)
     ap.add_argument("--max-range-pct", type=float)
     ap.add_argument("--order-usdt", type=float)
     ap.add_argument("--effective-exposure", type=float, default=1.0)
+    ap.add_argument("--engine", choices=["loop", "numpy"], default="numpy")
     a = ap.parse_args()
 
     cfg = BacktestConfig(
-        symbol="BTCETH_RATIO",
+        symbol=f"{a.base.upper().removesuffix('USDT')}{a.quote.upper().removesuffix('USDT')}_RATIO",
         levels=a.levels,
         step_pct=a.step_pct,
         tp_pct=a.tp_pct,
@@ -25,8 +29,8 @@ def main():
         max_range_pct=a.max_range_pct,
     )
 
-    df = fetch_ratio_klines(a.start, a.end, a.interval)
-    out = backtest(df, cfg)
+    df = fetch_ratio_klines(a.start, a.end, a.interval, data_dir=a.data_dir, base=a.base, quote=a.quote)
+    out = backtest(df, cfg, engine=a.engine)
 
     print("=== RATIO GRID BACKTEST ===")
     print(out)
@@ -0,0 +1,108 @@
+# src/backtest/run_sweep.py
+import argparse
+import csv
+import itertools
+import os
+import tempfile
+import time
+from dataclasses import asdict
+from multiprocessing import Pool
+from typing import List
+
+import numpy as np
+
+from src.backtest.engine import BacktestConfig, Bars, backtest_bars
+from src.backtest.store import load_futures_klines
+from src.bot.exchange.filters import public_symbol_filters
+
+FIELDS = ["levels", "step_pct", "tp_pct", "max_range_pct", "cycles_long", "cycles_short",
+          "pnl_long", "pnl_short", "total_pnl", "bars", "stopped_by_breakout"]
+
+# Per-worker candles and their block indexes, built once by _init_worker
+_BARS = None
+_MID = 0.0
+
+def parse_range(spec: str, cast=float) -> List:
+    """``"0.1,0.2"`` -> list, ``"0.1:0.5:0.1"`` -> inclusive range, ``"20"`` -> single value."""
+    if ":" in spec:
+        a, b, step = (float(x) for x in spec.split(":"))
+        n = int(round((b - a) / step)) + 1
+        return [cast(round(a + i * step, 10)) for i in range(n)]
+    return [cast(x) for x in spec.split(",")]
+
+def _init_worker(low_path: str, high_path: str, mid: float):
+    global _BARS, _MID
+    # Every worker maps the same files, so the candles sit in the page cache once
+    _BARS = Bars(np.load(low_path, mmap_mode="r"), np.load(high_path, mmap_mode="r"))
+    _MID = mid
+
+def _run_one(cfg: BacktestConfig) -> dict:
+    res = backtest_bars(_BARS, _MID, cfg)
+    row = {"levels": cfg.levels, "step_pct": cfg.step_pct, "tp_pct": cfg.tp_pct,
+           "max_range_pct": cfg.max_range_pct}
+    row.update({k: v for k, v in asdict(res).items() if k in FIELDS})
+    return row
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Parallel parameter sweep for the both-sides grid")
+    ap.add_argument("--symbol", default="BTCUSDT")
+    ap.add_argument("--interval", default="1m")
+    ap.add_argument("--data-dir", default=None)
+    ap.add_argument("--start", required=True)
+    ap.add_argument("--end", required=True)
+    ap.add_argument("--levels", default="20", help="e.g. 10,20,40 or 10:40:5")
+    ap.add_argument("--step-pct", default="0.25")
+    ap.add_argument("--tp-pct", default="0.20")
+    ap.add_argument("--max-range-pct", default="4.0")
+    ap.add_argument("--order-usdt", type=float, default=20.0)
+    ap.add_argument("--effective-exposure", type=float, default=1.2)
+    ap.add_argument("--exchange-filters", action="store_true",
+                    help="round grid prices/qty to the symbol's tick/lot size like the live bot")
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--out", default="sweep.csv", help="leaderboard CSV, appended as results finish")
+    ap.add_argument("--top", type=int, default=10)
+    return ap.parse_args()
+
+def main():
+    a = parse_args()
+    df = load_futures_klines(a.symbol, a.interval, a.start, a.end, data_dir=a.data_dir)
+    df = df.sort_values("time").reset_index(drop=True)
+    mid = float(df["close"].iloc[0])
+
+    filters = public_symbol_filters(a.symbol) if a.exchange_filters else None
+    configs = [
+        BacktestConfig(symbol=a.symbol, levels=lv, step_pct=st, tp_pct=tp, order_usdt=a.order_usdt,
+                       effective_exposure=a.effective_exposure, max_range_pct=rg, filters=filters)
+        for lv, st, tp, rg in itertools.product(parse_range(a.levels, int), parse_range(a.step_pct),
+                                                parse_range(a.tp_pct), parse_range(a.max_range_pct))
+    ]
+    print(f"Sweeping {len(configs)} configs over {len(df)} bars on {a.workers} workers")
+
+    rows = []
+    t0 = time.time()
+    with tempfile.TemporaryDirectory(prefix="fgrid-sweep-") as tmp:
+        low_path, high_path = os.path.join(tmp, "low.npy"), os.path.join(tmp, "high.npy")
+        np.save(low_path, df["low"].to_numpy(dtype=float))
+        np.save(high_path, df["high"].to_numpy(dtype=float))
+        del df
+
+        with open(a.out, "w", newline="") as f, \
+                Pool(a.workers, initializer=_init_worker, initargs=(low_path, high_path, mid)) as pool:
+            w = csv.DictWriter(f, fieldnames=FIELDS)
+            w.writeheader()
+            chunksize = max(1, len(configs) // (a.workers * 16))
+            for row in pool.imap_unordered(_run_one, configs, chunksize=chunksize):
+                w.writerow(row)
+                f.flush()
+                rows.append(row)
+
+    dt = time.time() - t0
+    print(f"Done in {dt:.1f}s ({len(rows) / max(dt, 1e-9):.1f} configs/s) -> {a.out}")
+    print(f"=== TOP {a.top} BY TOTAL PnL ===")
+    for r in sorted(rows, key=lambda r: r["total_pnl"], reverse=True)[:a.top]:
+        print(f"levels={r['levels']:<4} step={r['step_pct']:<6} tp={r['tp_pct']:<6} range={r['max_range_pct']:<6} "
+              f"cycles={r['cycles_long']}/{r['cycles_short']}  PnL={r['total_pnl']:.4f}  "
+              f"breakout={r['stopped_by_breakout']}")
+
+if __name__ == "__main__":
+    main()
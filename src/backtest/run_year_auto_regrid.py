@@ -1,59 +1,32 @@
 # src/backtest/run_year_auto_regrid.py
 import argparse
+from dataclasses import asdict
+from typing import Optional
 import pandas as pd
-from src.backtest.fetch import fetch_futures_klines
-from src.backtest.engine import BacktestConfig, backtest
-
-def sessionize(df: pd.DataFrame, cfg: BacktestConfig):
-    i = 0
-    total_long = total_short = 0.0
-    cycles_l = cycles_s = 0
-    sessions = 0
-
-    while i < len(df):
-        # Run one session from i → end
-        slice_df = df.iloc[i:].reset_index(drop=True)
-        res = backtest(slice_df, cfg)
-        sessions += 1
-        total_long += res.pnl_long
-        total_short += res.pnl_short
-        cycles_l += res.cycles_long
-        cycles_s += res.cycles_short
-
-        if not res.stopped_by_breakout:
-            break  # reached end with no breakout
-
-        # Find breakout bar relative to this slice's mid/guards
-        mid = float(slice_df.iloc[0]["close"])
-        low_guard  = mid * (1 - cfg.max_range_pct/100.0)
-        high_guard = mid * (1 + cfg.max_range_pct/100.0)
-
-        j = 0
-        while j < len(slice_df):
-            low = float(slice_df.iloc[j]["low"])
-            high = float(slice_df.iloc[j]["high"])
-            if low < low_guard or high > high_guard:
-                j += 1  # advance past breakout bar
-                break
-            j += 1
-
-        if j <= 0:
-            j = 1  # safety
-        i += j   # start next session after the breakout
+from src.backtest.cache import DEFAULT_CACHE_MB, ResultCache
+from src.backtest.store import load_futures_klines
+from src.backtest.engine import BacktestConfig, sessionize as run_sessions
+from src.bot.exchange.filters import public_symbol_filters
 
+def sessionize(df: pd.DataFrame, cfg: BacktestConfig, cache: Optional[ResultCache] = None):
+    sessions = run_sessions(df, cfg, cache=cache)
+    total_long = sum(s.pnl_long for s in sessions)
+    total_short = sum(s.pnl_short for s in sessions)
     return {
-        "sessions": sessions,
-        "cycles_long": cycles_l,
-        "cycles_short": cycles_s,
+        "sessions": len(sessions),
+        "cycles_long": sum(s.cycles_long for s in sessions),
+        "cycles_short": sum(s.cycles_short for s in sessions),
         "pnl_long": total_long,
         "pnl_short": total_short,
         "total_pnl": total_long + total_short,
+        "detail": sessions,
     }
 
 def parse_args():
     ap = argparse.ArgumentParser(description="Year backtest with auto-regrid sessions")
     ap.add_argument("--symbol", default="BTCUSDT")
     ap.add_argument("--interval", default="1m")
+    ap.add_argument("--data-dir", default=None, help="local kline store (default: $FGRID_DATA_DIR or ./data)")
     ap.add_argument("--start", default="2025-01-01")
     ap.add_argument("--end", default="2025-12-31")
     ap.add_argument("--levels", type=int, default=20)
@@ -62,11 +35,16 @@ def parse_args():
     ap.add_argument("--order-usdt", type=float, default=20.0)
     ap.add_argument("--max-range-pct", type=float, default=12.0)
     ap.add_argument("--effective-exposure", type=float, default=1.2)
+    ap.add_argument("--exchange-filters", action="store_true",
+                    help="round grid prices/qty to the symbol's tick/lot size like the live bot")
+    ap.add_argument("--sessions-csv", default=None, help="write per-session stats to this CSV")
+    ap.add_argument("--no-cache", action="store_true", help="always recompute instead of reusing cached sessions")
+    ap.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="size bound of the result cache")
     return ap.parse_args()
 
 def main():
     a = parse_args()
-    df = fetch_futures_klines(a.symbol, a.interval, a.start, a.end)
+    df = load_futures_klines(a.symbol, a.interval, a.start, a.end, data_dir=a.data_dir)
     cfg = BacktestConfig(
         symbol=a.symbol,
         levels=a.levels,
@@ -75,8 +53,10 @@ def main():
         order_usdt=a.order_usdt,
         effective_exposure=a.effective_exposure,
         max_range_pct=a.max_range_pct,
+        filters=public_symbol_filters(a.symbol) if a.exchange_filters else None,
     )
-    out = sessionize(df, cfg)
+    cache = None if a.no_cache else ResultCache(a.data_dir and f"{a.data_dir}/results", a.cache_mb)
+    out = sessionize(df, cfg, cache)
     print("=== YEAR AUTO-REGRID BACKTEST ===")
     print(f"Symbol: {a.symbol}  Period: {a.start} -> {a.end}  Interval: {a.interval}")
     print(f"Levels: {a.levels}  Step/TP: {a.step_pct}/{a.tp_pct}  Range: ±{a.max_range_pct}%")
@@ -85,6 +65,9 @@ def main():
     print(f"Cycles (L/S): {out['cycles_long']} / {out['cycles_short']}")
     print(f"PnL     (L/S): {out['pnl_long']:.4f} / {out['pnl_short']:.4f} USDT")
     print(f"TOTAL PnL:     {out['total_pnl']:.4f} USDT")
+    if a.sessions_csv:
+        pd.DataFrame([asdict(s) for s in out["detail"]]).to_csv(a.sessions_csv, index=False)
+        print(f"Per-session stats -> {a.sessions_csv}")
 
 if __name__ == "__main__":
     main()
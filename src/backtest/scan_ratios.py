@@ -0,0 +1,104 @@
+# src/backtest/scan_ratios.py
+import argparse
+import csv
+import itertools
+import time
+from dataclasses import asdict
+from typing import List, Tuple
+
+import numpy as np
+
+from src.backtest.engine import BacktestConfig, BacktestResult, backtest_arrays
+from src.backtest.fetch_ratio import LegPanel, load_panel
+
+DEFAULT_UNIVERSE = [
+    "BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "XRPUSDT", "DOGEUSDT", "ADAUSDT", "AVAXUSDT", "LINKUSDT",
+    "DOTUSDT", "LTCUSDT", "BCHUSDT", "TRXUSDT", "ATOMUSDT", "NEARUSDT", "UNIUSDT", "ETCUSDT", "FILUSDT",
+    "APTUSDT", "ARBUSDT", "OPUSDT", "INJUSDT", "SUIUSDT", "AAVEUSDT", "XLMUSDT", "HBARUSDT", "ICPUSDT",
+    "TIAUSDT", "SEIUSDT", "WLDUSDT",
+]
+
+FIELDS = ["pair", "bars", "cycles_long", "cycles_short", "total_pnl", "unrealized_pnl", "max_drawdown",
+          "peak_exposure", "winrate", "stopped_by_breakout"]
+RANKINGS = {
+    "total_pnl": lambda r: r["total_pnl"],
+    "equity": lambda r: r["total_pnl"] + r["unrealized_pnl"],
+    "pnl_per_drawdown": lambda r: (r["total_pnl"] / r["max_drawdown"] if r["max_drawdown"] > 0
+                                   else float("inf") if r["total_pnl"] > 0 else 0.0),
+}
+
+def scan_pair(panel: LegPanel, base: str, quote: str, cfg: BacktestConfig) -> BacktestResult:
+    """Grid on base/quote from the first bar both legs have, centred on that bar's ratio close."""
+    low, high, close = panel.ratio(base, quote)
+    valid = np.flatnonzero(~np.isnan(close))
+    if valid.size == 0:
+        raise ValueError(f"{base} and {quote} share no bars")
+    i = int(valid[0])
+    return backtest_arrays(low[i:], high[i:], float(close[i]), cfg, close=close[i:])
+
+def parse_pairs(spec: str, symbols: List[str]) -> List[Tuple[str, str]]:
+    """``"all"`` -> every unordered pair of ``symbols``; else ``"BTCUSDT/ETHUSDT,SOLUSDT/ETHUSDT"``."""
+    if spec == "all":
+        return list(itertools.combinations(symbols, 2))
+    return [tuple(p.upper().split("/")) for p in spec.split(",")]
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Rank pair-ratio grids over a universe of perpetuals")
+    ap.add_argument("--symbols", default=",".join(DEFAULT_UNIVERSE))
+    ap.add_argument("--pairs", default="all", help='"all" or e.g. BTCUSDT/ETHUSDT,SOLUSDT/ETHUSDT')
+    ap.add_argument("--interval", default="1m")
+    ap.add_argument("--data-dir", default=None)
+    ap.add_argument("--start", required=True)
+    ap.add_argument("--end", required=True)
+    ap.add_argument("--workers", type=int, default=4, help="legs downloaded at once")
+    ap.add_argument("--levels", type=int, default=20)
+    ap.add_argument("--step-pct", type=float, default=0.25)
+    ap.add_argument("--tp-pct", type=float, default=0.20)
+    ap.add_argument("--order-usdt", type=float, default=20.0)
+    ap.add_argument("--max-range-pct", type=float, default=4.0)
+    ap.add_argument("--effective-exposure", type=float, default=1.0)
+    ap.add_argument("--rank-by", choices=sorted(RANKINGS), default="total_pnl")
+    ap.add_argument("--out", default="ratio_scan.csv")
+    ap.add_argument("--top", type=int, default=10)
+    return ap.parse_args()
+
+def main():
+    a = parse_args()
+    symbols = [s.strip().upper() for s in a.symbols.split(",") if s.strip()]
+    pairs = parse_pairs(a.pairs, symbols)
+    legs = sorted({s for p in pairs for s in p})
+
+    t0 = time.time()
+    panel = load_panel(legs, a.interval, a.start, a.end, data_dir=a.data_dir, workers=a.workers)
+    print(f"Loaded {len(panel.symbols)}/{len(legs)} legs x {len(panel.time)} bars in {time.time() - t0:.1f}s")
+
+    rows = []
+    t0 = time.time()
+    with open(a.out, "w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDS)
+        w.writeheader()
+        for base, quote in pairs:
+            if base not in panel.symbols or quote not in panel.symbols:
+                continue
+            cfg = BacktestConfig(symbol=f"{base}/{quote}", levels=a.levels, step_pct=a.step_pct, tp_pct=a.tp_pct,
+                                 order_usdt=a.order_usdt, effective_exposure=a.effective_exposure,
+                                 max_range_pct=a.max_range_pct)
+            try:
+                res = scan_pair(panel, base, quote, cfg)
+            except ValueError as e:
+                print(f"skip {base}/{quote}: {e}")
+                continue
+            row = {"pair": cfg.symbol}
+            row.update({k: v for k, v in asdict(res).items() if k in FIELDS})
+            w.writerow(row)
+            rows.append(row)
+
+    print(f"Scanned {len(rows)} pairs in {time.time() - t0:.1f}s -> {a.out}")
+    print(f"=== TOP {a.top} BY {a.rank_by.upper()} ===")
+    for r in sorted(rows, key=RANKINGS[a.rank_by], reverse=True)[:a.top]:
+        print(f"{r['pair']:<22} cycles={r['cycles_long']}/{r['cycles_short']}  PnL={r['total_pnl']:.4f}  "
+              f"unrealized={r['unrealized_pnl']:.4f}  maxDD={r['max_drawdown']:.4f}  "
+              f"bars={r['bars']}  breakout={r['stopped_by_breakout']}")
+
+if __name__ == "__main__":
+    main()
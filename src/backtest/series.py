@@ -0,0 +1,56 @@
+# src/backtest/series.py
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Per-bar backtest columns: an int64 timestamp plus four float32 values (24 bytes per bar in total)
+DTYPES: Dict[str, str] = {
+    "time": "int64",        # bar open time, epoch ms
+    "equity": "float32",    # realized + unrealized PnL at the bar's close (breakout bar: at the guard)
+    "long_qty": "float32",  # open long quantity after the bar's fills
+    "short_qty": "float32",
+    "drawdown": "float32",  # equity below its running peak
+}
+
+class SeriesWriter:
+    """Appends per-bar series chunk by chunk and leaves ``<path>/<column>.npy`` files, the same
+    columnar layout as the kline store. Chunks go to raw files first, so memory stays bounded by
+    one chunk whatever the total length."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.n = 0
+        self._raw = {c: open(self.path / f"{c}.raw", "wb") for c in DTYPES}
+
+    def append(self, cols: Dict[str, np.ndarray]):
+        for c, f in self._raw.items():
+            np.asarray(cols[c], dtype=DTYPES[c]).tofile(f)
+        self.n += len(cols["equity"])
+
+    def close(self):
+        for c, f in self._raw.items():
+            f.close()
+            raw = self.path / f"{c}.raw"
+            out = np.lib.format.open_memmap(self.path / f"{c}.npy", mode="w+", dtype=DTYPES[c], shape=(self.n,))
+            if self.n:
+                out[:] = np.memmap(raw, dtype=DTYPES[c], mode="r", shape=(self.n,))
+            out.flush()
+            del out
+            raw.unlink()
+
+    def __enter__(self) -> "SeriesWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load_series(path: str) -> pd.DataFrame:
+    """Frame of the series written by ``SeriesWriter`` (columns memory-mapped, ``time`` as UTC datetimes)."""
+    p = Path(path)
+    cols = {c: np.load(p / f"{c}.npy", mmap_mode="r") for c in DTYPES}
+    df = pd.DataFrame({c: v for c, v in cols.items() if c != "time"})
+    df.insert(0, "time", pd.to_datetime(np.asarray(cols["time"]), unit="ms", utc=True))
+    return df
@@ -0,0 +1,254 @@
+# src/backtest/sim.py
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from src.bot.exchange.filters import SymbolFilters
+
+EPS = 1e-12
+
+class VirtualClock:
+    """Replay time. ``time``/``monotonic`` return the simulated time and ``sleep`` advances it,
+    so rate-limit waits cost no wall time. With ``speed`` > 0 every advance is also paced at
+    ``speed`` x wall clock; 0 replays as fast as possible."""
+
+    def __init__(self, start: float, speed: float = 0.0):
+        self.now = start
+        self.speed = speed
+        self.lock = threading.Lock()
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.now += seconds
+        if self.speed > 0:
+            time.sleep(seconds / self.speed)
+
+    def advance_to(self, t: float):
+        self.sleep(t - self.now)
+
+class SimError(Exception):
+    """Rejection raised like the connector's ClientError (``status_code``/``error_code``)."""
+
+    def __init__(self, error_code: int, msg: str, status_code: int = 400):
+        super().__init__(f"({status_code}, {error_code}, '{msg}')")
+        self.status_code = status_code
+        self.error_code = error_code
+        self.error_message = msg
+
+@dataclass
+class SimOrder:
+    order_id: int
+    side: str
+    type: str              # LIMIT or STOP_MARKET
+    qty: float
+    price: float           # limit price, or stop price for STOP_MARKET
+    reduce_only: bool = False
+    close_position: bool = False
+
+class SimExchange:
+    """In-process stand-in for ``UMFutures`` on one symbol, for ``BinanceUM(client=...)``.
+
+    Implements the endpoints the bot calls. Price moves come from ``move_to``; resting orders fill
+    at their own price when the move reaches it (touch-to-fill, no fees or slippage), and every fill
+    is queued in ``events`` as the ORDER_TRADE_UPDATE + ACCOUNT_UPDATE pair the user-data stream
+    would send. One-way mode: a single net position, reduce-only orders only fill while they reduce it.
+    """
+
+    def __init__(self, symbol: str, filters: SymbolFilters, clock: VirtualClock, price: float):
+        self.symbol = symbol
+        self.filters = filters
+        self.clock = clock
+        self.last = price
+        self.orders: Dict[int, SimOrder] = {}
+        self.position = 0.0
+        self.entry_price = 0.0
+        self.realized = 0.0
+        self.fills = 0
+        self.rejects = 0
+        self.calls = Counter()
+        self.events = deque()
+        self._next_id = 1
+        self.lock = threading.RLock()
+
+    # --- endpoints used by BinanceUM ---
+
+    def exchange_info(self):
+        self.calls["exchange_info"] += 1
+        f = self.filters
+        fs = [{"filterType": "PRICE_FILTER", "tickSize": str(f.tick)},
+              {"filterType": "LOT_SIZE", "stepSize": str(f.step), "minQty": str(f.min_qty)}]
+        if f.min_notional:
+            fs.append({"filterType": "MIN_NOTIONAL", "notional": str(f.min_notional)})
+        return {"symbols": [{"symbol": self.symbol, "filters": fs}]}
+
+    def ticker_price(self, symbol: Optional[str] = None):
+        self.calls["ticker_price"] += 1
+        t = {"symbol": self.symbol, "price": str(self.last)}
+        return t if symbol else [t]
+
+    def change_margin_type(self, **kwargs):
+        self.calls["change_margin_type"] += 1
+        return {}
+
+    def change_leverage(self, **kwargs):
+        self.calls["change_leverage"] += 1
+        return {}
+
+    def new_order(self, **params):
+        self.calls["new_order"] += 1
+        return self._new(params)
+
+    def new_batch_order(self, batchOrders: List[dict]):
+        self.calls["new_batch_order"] += 1
+        out = []
+        for p in batchOrders:
+            try:
+                out.append(self._new(p))
+            except SimError as e:
+                out.append({"code": e.error_code, "msg": e.error_message})
+        return out
+
+    def cancel_open_orders(self, symbol: str):
+        self.calls["cancel_open_orders"] += 1
+        with self.lock:
+            for oid in list(self.orders):
+                self._close(oid, "CANCELED")
+        return {"code": 200, "msg": "The operation of cancel all open order is done."}
+
+    def cancel_batch_order(self, symbol: str, orderIdList: List[int], origClientOrderIdList: List[str]):
+        self.calls["cancel_batch_order"] += 1
+        out = []
+        with self.lock:
+            for oid in orderIdList:
+                if oid in self.orders:
+                    out.append(self._view(self.orders[oid], "CANCELED"))
+                    self._close(oid, "CANCELED")
+                else:
+                    out.append({"code": -2011, "msg": "Unknown order sent."})
+        return out
+
+    def get_orders(self, symbol: Optional[str] = None):
+        """GET /fapi/v1/openOrders: every open order."""
+        self.calls["get_orders"] += 1
+        with self.lock:
+            return [self._view(o, "NEW") for o in self.orders.values()]
+
+    def get_open_orders(self, symbol: str, orderId: Optional[int] = None, origClientOrderId: Optional[str] = None):
+        """GET /fapi/v1/openOrder: one open order, which the connector insists on being named."""
+        self.calls["get_open_orders"] += 1
+        if orderId is None and origClientOrderId is None:
+            raise SimError(-1102, "Mandatory parameter 'orderId' was not sent, was empty/null, or malformed.")
+        with self.lock:
+            if orderId not in self.orders:
+                raise SimError(-2013, "Order does not exist.")
+            return self._view(self.orders[orderId], "NEW")
+
+    def new_listen_key(self):
+        self.calls["new_listen_key"] += 1
+        return {"listenKey": "sim"}
+
+    def renew_listen_key(self, listenKey: str):
+        self.calls["renew_listen_key"] += 1
+        return {}
+
+    # --- matching ---
+
+    def move_to(self, price: float):
+        """Move the market from ``last`` to ``price``, filling every order the move reaches in path order."""
+        with self.lock:
+            up = price > self.last
+            hit = [o for o in self.orders.values() if self._reached(o, price)]
+            hit.sort(key=lambda o: o.price, reverse=not up)
+            for o in hit:
+                self._execute(o, o.price)
+            self.last = price
+
+    @staticmethod
+    def _triggers_up(o: SimOrder) -> bool:
+        # SELL limits and BUY stops trigger on the way up
+        return (o.side == "SELL") == (o.type == "LIMIT")
+
+    def _reached(self, o: SimOrder, price: float) -> bool:
+        return price >= o.price if self._triggers_up(o) else price <= o.price
+
+    def _reduces(self, side: str, qty: float) -> bool:
+        return (self.position >= qty - EPS) if side == "SELL" else (-self.position >= qty - EPS)
+
+    def _new(self, p: dict) -> dict:
+        with self.lock:
+            side, kind = p["side"], p["type"]
+            if kind == "LIMIT":
+                o = SimOrder(self._next_id, side, kind, float(p["quantity"]), float(p["price"]),
+                             reduce_only=str(p.get("reduceOnly")).lower() == "true")
+                if o.reduce_only and not self._reduces(side, o.qty):
+                    self.rejects += 1
+                    raise SimError(-2022, "ReduceOnly Order is rejected.")
+            elif kind == "STOP_MARKET":
+                o = SimOrder(self._next_id, side, kind, 0.0, float(p["stopPrice"]), reduce_only=True,
+                             close_position=str(p.get("closePosition")).lower() == "true")
+                if self._reached(o, self.last):
+                    self.rejects += 1
+                    raise SimError(-2021, "Order would immediately trigger.")
+            else:
+                self.rejects += 1
+                raise SimError(-1116, "Invalid orderType.")
+            self._next_id += 1
+            self.orders[o.order_id] = o
+            res = self._view(o, "NEW")
+            if kind == "LIMIT" and self._reached(o, self.last):
+                # Marketable limit: takes the book at the current price
+                self._execute(o, self.last)
+                res["status"] = "FILLED"
+            return res
+
+    def _execute(self, o: SimOrder, price: float):
+        qty = abs(self.position) if o.close_position else o.qty
+        if o.reduce_only and (qty <= EPS or not self._reduces(o.side, qty)):
+            self._close(o.order_id, "EXPIRED")
+            return
+        signed = qty if o.side == "BUY" else -qty
+        realized = 0.0
+        if self.position and (self.position > 0) != (signed > 0):
+            closed = min(qty, abs(self.position))
+            realized = closed * (price - self.entry_price) * (1 if self.position > 0 else -1)
+            if qty > abs(self.position):
+                self.entry_price = price  # flipped through zero
+        else:
+            self.entry_price = (self.entry_price * abs(self.position) + price * qty) / (abs(self.position) + qty)
+        self.position = round(self.position + signed, 12)
+        if self.position == 0:
+            self.entry_price = 0.0
+        self.realized += realized
+        self.fills += 1
+        del self.orders[o.order_id]
+        ms = int(self.clock.time() * 1000)
+        self.events.append({"e": "ACCOUNT_UPDATE", "E": ms, "a": {"m": "ORDER", "P": [
+            {"s": self.symbol, "pa": str(self.position), "ep": str(self.entry_price)}]}})
+        self.events.append({"e": "ORDER_TRADE_UPDATE", "E": ms, "o": {
+            "s": self.symbol, "i": o.order_id, "S": o.side, "o": o.type, "X": "FILLED", "x": "TRADE",
+            "q": str(qty), "z": str(qty), "ap": str(price), "L": str(price),
+            "sp": str(o.price if o.type != "LIMIT" else 0), "R": o.reduce_only, "rp": str(realized)}})
+
+    def _close(self, oid: int, status: str):
+        o = self.orders.pop(oid)
+        self.events.append({"e": "ORDER_TRADE_UPDATE", "E": int(self.clock.time() * 1000), "o": {
+            "s": self.symbol, "i": oid, "S": o.side, "o": o.type, "X": status, "x": status,
+            "q": str(o.qty), "z": "0", "R": o.reduce_only}})
+
+    def _view(self, o: SimOrder, status: str) -> dict:
+        return {"orderId": o.order_id, "symbol": self.symbol, "status": status, "side": o.side, "type": o.type,
+                "price": str(o.price if o.type == "LIMIT" else 0), "stopPrice": str(o.price if o.type != "LIMIT" else 0),
+                "origQty": str(o.qty), "reduceOnly": o.reduce_only, "closePosition": o.close_position}
+
+    def unrealized(self) -> float:
+        return self.position * (self.last - self.entry_price) if self.position else 0.0
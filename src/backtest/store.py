@@ -0,0 +1,305 @@
+# src/backtest/store.py
+import io
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.backtest.fetch import interval_ms, to_ms
+from src.backtest.fetch_async import fetch_funding_rates, fetch_futures_klines_concurrent
+from src.backtest.funding import FundingHistory
+
+DEFAULT_DATA_DIR = os.getenv("FGRID_DATA_DIR", "data")
+DEFAULT_CHUNK_BARS = 1_000_000
+FETCH_WINDOW_BARS = 200_000  # bars fetched and stored per request batch (~4.6 months of 1m)
+COPY_ROWS = 1 << 20  # rows per piece when a column file is rebuilt
+
+# One .npy file per column; times are int64 epoch milliseconds
+COLUMNS = {"open_time": np.int64, "open": np.float64, "high": np.float64, "low": np.float64,
+           "close": np.float64, "volume": np.float64, "close_time": np.int64}
+
+Range = Tuple[int, int]  # half-open [start_ms, end_ms) over open_time
+
+def _merge_ranges(ranges: List[Range]) -> List[Range]:
+    out: List[Range] = []
+    for a, b in sorted(ranges):
+        if out and a <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], b))
+        else:
+            out.append((a, b))
+    return out
+
+def _gaps(ranges: List[Range], start_ms: int, end_ms: int) -> List[Range]:
+    """Parts of ``[start_ms, end_ms)`` not covered by the sorted, merged ``ranges``."""
+    gaps, cur = [], start_ms
+    for a, b in ranges:
+        if b <= cur:
+            continue
+        if a >= end_ms:
+            break
+        if a > cur:
+            gaps.append((cur, a))
+        cur = max(cur, b)
+    if cur < end_ms:
+        gaps.append((cur, end_ms))
+    return gaps
+
+def _append_npy(path: Path, rows: int, values: np.ndarray) -> bool:
+    """Write ``values`` after the first ``rows`` entries of the 1-D .npy at ``path``, then grow its
+    shape in place. Anything past ``rows`` (left by an interrupted append) is overwritten. False,
+    with the file untouched, when the header has no room for the new length."""
+    fmt = np.lib.format
+    with open(path, "r+b") as f:
+        version = fmt.read_magic(f)
+        read, write = ((fmt.read_array_header_1_0, fmt.write_array_header_1_0) if version == (1, 0)
+                       else (fmt.read_array_header_2_0, fmt.write_array_header_2_0))
+        _, _, dtype = read(f)
+        offset = f.tell()
+        header = io.BytesIO()
+        write(header, {"descr": fmt.dtype_to_descr(dtype), "fortran_order": False, "shape": (rows + len(values),)})
+        if header.tell() != offset:
+            return False
+        f.seek(offset + rows * dtype.itemsize)
+        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+        f.truncate()
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())  # last, so a crash before it leaves the old length
+    return True
+
+def frame_from_columns(cols: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """Same schema as ``fetch_futures_klines``: time, open, high, low, close, volume, close_time."""
+    return pd.DataFrame({
+        "time": pd.to_datetime(np.asarray(cols["open_time"]), unit="ms", utc=True),
+        "open": np.asarray(cols["open"]),
+        "high": np.asarray(cols["high"]),
+        "low": np.asarray(cols["low"]),
+        "close": np.asarray(cols["close"]),
+        "volume": np.asarray(cols["volume"]),
+        "close_time": pd.to_datetime(np.asarray(cols["close_time"]), unit="ms", utc=True),
+    })
+
+def columns_from_frame(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    return {
+        "open_time": df["time"].to_numpy(dtype="datetime64[ms]").astype(np.int64),
+        "open": df["open"].to_numpy(dtype=np.float64),
+        "high": df["high"].to_numpy(dtype=np.float64),
+        "low": df["low"].to_numpy(dtype=np.float64),
+        "close": df["close"].to_numpy(dtype=np.float64),
+        "volume": df["volume"].to_numpy(dtype=np.float64),
+        "close_time": df["close_time"].to_numpy(dtype="datetime64[ms]").astype(np.int64),
+    }
+
+class KlineStore:
+    """Columnar on-disk kline cache keyed by (symbol, interval).
+
+    Layout: ``<root>/klines/<SYMBOL>/<interval>/<column>.npy`` plus ``ranges.json`` listing the
+    open_time ranges already downloaded, so repeat queries only fetch the gaps. Gaps are fetched
+    ``window_bars`` at a time, so a cold multi-year download never holds more than one window.
+    """
+
+    def __init__(self, root: Optional[str] = None,
+                 fetcher: Callable[[str, str, int, int], pd.DataFrame] = fetch_futures_klines_concurrent,
+                 window_bars: int = FETCH_WINDOW_BARS):
+        self.root = Path(root or DEFAULT_DATA_DIR)
+        self.fetcher = fetcher
+        self.window_bars = window_bars
+
+    def _dir(self, symbol: str, interval: str) -> Path:
+        return self.root / "klines" / symbol.upper() / interval
+
+    def ranges(self, symbol: str, interval: str) -> List[Range]:
+        p = self._dir(symbol, interval) / "ranges.json"
+        if not p.exists():
+            return []
+        return [tuple(r) for r in json.loads(p.read_text())]
+
+    def missing(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Range]:
+        """Interval-aligned gaps of ``[start_ms, end_ms)`` not covered yet."""
+        iv = interval_ms(interval)
+        return _gaps(self.ranges(symbol, interval), start_ms // iv * iv, -(-end_ms // iv) * iv)
+
+    def _read(self, symbol: str, interval: str) -> Dict[str, np.ndarray]:
+        d = self._dir(symbol, interval)
+        if not (d / "open_time.npy").exists():
+            return {c: np.empty(0, dtype=t) for c, t in COLUMNS.items()}
+        return {c: np.load(d / f"{c}.npy", mmap_mode="r") for c in COLUMNS}
+
+    def _write_ranges(self, symbol: str, interval: str, ranges: List[Range]):
+        d = self._dir(symbol, interval)
+        d.mkdir(parents=True, exist_ok=True)
+        tmp = d / "ranges.tmp.json"
+        tmp.write_text(json.dumps([list(r) for r in _merge_ranges(ranges)]))
+        os.replace(tmp, d / "ranges.json")
+
+    def _add(self, symbol: str, interval: str, cols: Dict[str, np.ndarray]) -> int:
+        """Store rows fetched for one gap. Appends in place when they all come after the stored
+        rows (the usual forward update); otherwise each column is rebuilt piece by piece with the
+        new rows spliced in. Either way only the new rows are ever held in memory."""
+        d = self._dir(symbol, interval)
+        d.mkdir(parents=True, exist_ok=True)
+        order = np.argsort(cols["open_time"], kind="stable")
+        new_t = cols["open_time"][order]
+        fresh = np.ones(len(new_t), dtype=bool)
+        fresh[1:] = new_t[1:] != new_t[:-1]
+        old = self._read(symbol, interval)
+        t = old["open_time"]
+        n = len(t)
+        pos = np.searchsorted(t, new_t, side="left")
+        if n:
+            # Rows already stored (by an append interrupted before its range was recorded) are skipped
+            fresh &= np.asarray(t[np.minimum(pos, n - 1)]) != new_t
+        cols = {c: v[order][fresh] for c, v in cols.items()}
+        pos = pos[fresh]
+        k = len(pos)
+        if k == 0:
+            return 0
+        at = int(pos[0])
+        if at != pos[-1]:
+            raise RuntimeError(f"{d}: fetched rows interleave with stored ones; delete the directory to rebuild it")
+        # The time column goes last: its length is the row count the other columns are read against
+        names = [c for c in COLUMNS if c != "open_time"] + ["open_time"]
+        if at == n and n and all(_append_npy(d / f"{c}.npy", n, cols[c]) for c in names):
+            return k
+        for c in names:
+            tmp = d / f"{c}.tmp.npy"
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=COLUMNS[c], shape=(n + k,))
+            for i in range(0, at, COPY_ROWS):
+                out[i:min(i + COPY_ROWS, at)] = old[c][i:min(i + COPY_ROWS, at)]
+            out[at:at + k] = cols[c]
+            for i in range(at, n, COPY_ROWS):
+                out[k + i:k + min(i + COPY_ROWS, n)] = old[c][i:min(i + COPY_ROWS, n)]
+            out.flush()
+            del out
+            os.replace(tmp, d / f"{c}.npy")
+        return k
+
+    def update(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> int:
+        """Download whatever part of ``[start_ms, end_ms)`` is missing. Returns bars added.
+
+        Gaps are split into windows of ``window_bars``; each is stored, and recorded as covered, as
+        soon as it is fetched, so memory stays bounded by one window and an interrupted update
+        keeps what it already downloaded.
+        """
+        iv = interval_ms(interval)
+        span = self.window_bars * iv
+        # Never cache the candle that is still forming
+        closed_until = int(time.time() * 1000) // iv * iv
+        gaps = [(a, min(b, closed_until)) for a, b in self.missing(symbol, interval, start_ms, end_ms)]
+        gaps = [(w, min(w + span, b)) for a, b in gaps if a < b for w in range(a, b, span)]
+
+        added = 0
+        for a, b in gaps:
+            try:
+                df = self.fetcher(symbol, interval, a, b - 1)
+            except ValueError:
+                df = None  # nothing listed in this window; still recorded as covered
+            if df is not None:
+                cols = columns_from_frame(df)
+                keep = (cols["open_time"] >= a) & (cols["open_time"] < b)
+                added += self._add(symbol, interval, {c: v[keep] for c, v in cols.items()})
+            self._write_ranges(symbol, interval, self.ranges(symbol, interval) + [(a, b)])
+        return added
+
+    def arrays(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> Dict[str, np.ndarray]:
+        """Memory-mapped column views for ``[start_ms, end_ms)``; only touched pages are read."""
+        cols = self._read(symbol, interval)
+        t = cols["open_time"]
+        i, j = np.searchsorted(t, [start_ms, end_ms], side="left")
+        return {c: v[i:j] for c, v in cols.items()}
+
+    def load(self, symbol: str, interval: str, start, end) -> pd.DataFrame:
+        """Klines with open_time in ``[start, end]`` (inclusive, like the Binance API), fetching gaps first."""
+        start_ms, end_ms = to_ms(start), to_ms(end) + 1
+        self.update(symbol, interval, start_ms, end_ms)
+        cols = self.arrays(symbol, interval, start_ms, end_ms)
+        if len(cols["open_time"]) == 0:
+            raise ValueError(f"No klines returned for {symbol} {interval} {start}->{end}")
+        return frame_from_columns(cols)
+
+    def iter_frames(self, symbol: str, interval: str, start, end,
+                    chunk_bars: int = DEFAULT_CHUNK_BARS) -> Iterator[pd.DataFrame]:
+        """``load`` in pieces of at most ``chunk_bars`` rows, each copied out of the memmaps only when
+        reached, so a multi-year (or 1s) range never has to fit in memory at once. Missing bars are
+        downloaded first, one window at a time (see ``update``)."""
+        start_ms, end_ms = to_ms(start), to_ms(end) + 1
+        self.update(symbol, interval, start_ms, end_ms)
+        cols = self.arrays(symbol, interval, start_ms, end_ms)
+        n = len(cols["open_time"])
+        if n == 0:
+            raise ValueError(f"No klines returned for {symbol} {interval} {start}->{end}")
+        for i in range(0, n, chunk_bars):
+            yield frame_from_columns({c: np.array(v[i:i + chunk_bars]) for c, v in cols.items()})
+
+class FundingStore:
+    """Funding-rate cache next to the klines: ``<root>/funding/<SYMBOL>/{time,rate}.npy`` plus
+    ``ranges.json`` of the fundingTime ranges already downloaded. Same gap-only updates as ``KlineStore``."""
+
+    def __init__(self, root: Optional[str] = None,
+                 fetcher: Callable[[str, int, int], Tuple[np.ndarray, np.ndarray]] = fetch_funding_rates):
+        self.root = Path(root or DEFAULT_DATA_DIR)
+        self.fetcher = fetcher
+
+    def _dir(self, symbol: str) -> Path:
+        return self.root / "funding" / symbol.upper()
+
+    def ranges(self, symbol: str) -> List[Range]:
+        p = self._dir(symbol) / "ranges.json"
+        if not p.exists():
+            return []
+        return [tuple(r) for r in json.loads(p.read_text())]
+
+    def _read(self, symbol: str) -> FundingHistory:
+        d = self._dir(symbol)
+        if not (d / "time.npy").exists():
+            return FundingHistory(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        return FundingHistory(np.load(d / "time.npy"), np.load(d / "rate.npy"))
+
+    def update(self, symbol: str, start_ms: int, end_ms: int) -> int:
+        """Download whatever part of ``[start_ms, end_ms)`` is missing. Returns events added."""
+        now = int(time.time() * 1000)
+        gaps = [(a, min(b, now)) for a, b in _gaps(self.ranges(symbol), start_ms, end_ms)]
+        gaps = [(a, b) for a, b in gaps if a < b]
+        if not gaps:
+            return 0
+        old = self._read(symbol)
+        parts = [self.fetcher(symbol, a, b - 1) for a, b in gaps]
+        times = np.concatenate([old.time] + [t for t, _ in parts])
+        rates = np.concatenate([old.rate] + [r for _, r in parts])
+        times, first = np.unique(times, return_index=True)
+        d = self._dir(symbol)
+        d.mkdir(parents=True, exist_ok=True)
+        for name, v in (("time", times), ("rate", rates[first])):
+            tmp = d / f"{name}.tmp.npy"
+            np.save(tmp, v)
+            os.replace(tmp, d / f"{name}.npy")
+        tmp = d / "ranges.tmp.json"
+        tmp.write_text(json.dumps([list(r) for r in _merge_ranges(self.ranges(symbol) + gaps)]))
+        os.replace(tmp, d / "ranges.json")
+        return len(times) - len(old.time)
+
+    def load(self, symbol: str, start, end) -> FundingHistory:
+        """Funding events with fundingTime in ``[start, end]``, fetching gaps first."""
+        start_ms, end_ms = to_ms(start), to_ms(end) + 1
+        self.update(symbol, start_ms, end_ms)
+        h = self._read(symbol)
+        i, j = np.searchsorted(h.time, [start_ms, end_ms], side="left")
+        return FundingHistory(h.time[i:j], h.rate[i:j])
+
+def load_funding(symbol: str, start, end, data_dir: Optional[str] = None) -> FundingHistory:
+    """Cached funding history for ``BacktestConfig.funding``."""
+    return FundingStore(data_dir).load(symbol, start, end)
+
+def load_futures_klines(symbol: str, interval: str, start_str: str, end_str: str,
+                        data_dir: Optional[str] = None) -> pd.DataFrame:
+    """Cached drop-in for ``fetch_futures_klines``: serves from the local store, downloading only gaps."""
+    return KlineStore(data_dir).load(symbol, interval, start_str, end_str)
+
+def iter_futures_klines(symbol: str, interval: str, start_str: str, end_str: str,
+                        chunk_bars: int = DEFAULT_CHUNK_BARS, data_dir: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """Chunked ``load_futures_klines`` for ``backtest_chunks``."""
+    return KlineStore(data_dir).iter_frames(symbol, interval, start_str, end_str, chunk_bars)
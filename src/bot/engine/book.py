@@ -0,0 +1,104 @@
+from dataclasses import replace
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.bot.engine.state import GridOrder, GridSnapshot
+
+Slot = Tuple[str, int, str]  # (book, level, role)
+
+class LevelBook:
+    """In-memory grid book keyed by level, kept current from user-data stream events.
+
+    Each slot holds the order we want resting at that level/role; ``order_id`` is None while it is
+    not on the book. Handlers return the orders that must be (re)placed, never call the exchange.
+    """
+
+    def __init__(self, snap: GridSnapshot, desired: List[GridOrder]):
+        self.snap = snap
+        self.slots: Dict[Slot, GridOrder] = {(o.book, o.level, o.role): o for o in desired}
+        for o in desired:
+            o.order_id = None
+        for o in snap.orders:
+            slot = (o.book, o.level, o.role)
+            if slot in self.slots:
+                self.slots[slot].order_id = o.order_id
+        self.by_id: Dict[int, Slot] = {o.order_id: s for s, o in self.slots.items() if o.order_id is not None}
+        self.position = 0.0
+        self.fills = 0
+        # FILLED events that raced ahead of the placement response that tells us their id
+        self._early: Dict[int, dict] = {}
+        # Slots sent for placement and not (yet) on the book; left here when the request fails
+        self.unplaced: Set[Slot] = set()
+
+    def _pair(self, slot: Slot) -> GridOrder:
+        book, level, role = slot
+        return self.slots[(book, level, "tp" if role == "entry" else "entry")]
+
+    def _on_filled(self, slot: Slot) -> List[GridOrder]:
+        self.fills += 1
+        order = self.slots[slot]
+        self.by_id.pop(order.order_id, None)
+        order.order_id = None
+        pair = self._pair(slot)
+        # Entry filled -> its TP must rest; TP filled -> the level is flat again, re-arm the entry
+        return [pair] if pair.order_id is None else []
+
+    def on_order_update(self, o: dict) -> List[GridOrder]:
+        """``o`` is the ``"o"`` payload of an ORDER_TRADE_UPDATE event."""
+        slot = self.by_id.get(o.get("i"))
+        if slot is None:
+            if o.get("X") == "FILLED" and len(self._early) < 1000:
+                self._early[o.get("i")] = o
+            return []
+        status = o.get("X")
+        if status == "FILLED":
+            return self._on_filled(slot)
+        if status in ("CANCELED", "EXPIRED", "REJECTED"):
+            order = self.slots[slot]
+            self.by_id.pop(order.order_id, None)
+            order.order_id = None
+        return []
+
+    def on_account_update(self, a: dict, symbol: str):
+        """``a`` is the ``"a"`` payload of an ACCOUNT_UPDATE event."""
+        for p in a.get("P", []):
+            if p.get("s") == symbol:
+                self.position = float(p["pa"])
+
+    def on_placing(self, orders: List[GridOrder]):
+        self.unplaced.update((o.book, o.level, o.role) for o in orders)
+
+    def on_placed(self, order: GridOrder, order_id: Optional[int]) -> List[GridOrder]:
+        slot = (order.book, order.level, order.role)
+        self.slots[slot].order_id = order_id
+        if order_id is None:
+            return []  # rejected: stays unplaced for the next reconcile
+        self.unplaced.discard(slot)
+        self.by_id[order_id] = slot
+        early = self._early.pop(order_id, None)
+        return self.on_order_update(early) if early else []
+
+    def reconcile(self, open_orders: List[dict]) -> List[GridOrder]:
+        """After a stream gap: our orders missing from the book are taken as filled while we were away,
+        and placements that failed (still ``unplaced``) are tried again."""
+        live = {o["orderId"] for o in open_orders}
+        missing = {slot for oid, slot in self.by_id.items() if oid not in live}
+        had = {slot for slot, o in self.slots.items() if o.order_id is not None}
+        for slot in missing:
+            self.fills += 1
+            self.by_id.pop(self.slots[slot].order_id, None)
+            self.slots[slot].order_id = None
+        todo = []
+        for book, level, role in missing:
+            pair = self._pair((book, level, role))
+            if role == "tp" and pair.order_id is None:
+                todo.append(pair)   # round trip completed: re-arm the entry
+            elif role == "entry" and (book, level, "tp") not in had:
+                todo.append(pair)   # position opened and no TP was resting for it
+        todo += [self.slots[s] for s in sorted(self.unplaced)
+                 if self.slots[s].order_id is None and self.slots[s] not in todo]
+        self.unplaced.clear()
+        return todo
+
+    def snapshot(self) -> GridSnapshot:
+        self.snap.orders = [replace(o) for o in self.slots.values() if o.order_id is not None]
+        return self.snap
@@ -1,21 +1,39 @@
 from dataclasses import dataclass
 
+import numpy as np
+
+# Level states for array-backed grid books (backtester loop)
+LEVEL_IDLE, LEVEL_OPEN, LEVEL_DONE = 0, 1, 2
+
 @dataclass
 class GridSide:
-    entries: list
-    tps: list
+    """One side as parallel float64 arrays, level 0 nearest to mid: long entries descend, short
+    entries ascend, so a price band maps to a contiguous index range (see ``np.searchsorted``)."""
+    entries: np.ndarray
+    tps: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.entries)
 
 @dataclass
 class BothSidesGrid:
     longs: GridSide
     shorts: GridSide
 
-def build_both_sides(mid: float, levels: int, step_pct: float, tp_pct: float):
+def build_both_sides(mid: float, levels: int, step_pct: float, tp_pct: float, quantizer=None):
+    """Grid around ``mid``. With a ``Quantizer`` prices are rounded the way the exchange needs them:
+    BUY (long entry, short TP) down and SELL (short entry, long TP) up to the tick."""
     step = step_pct / 100.0
     tp = tp_pct / 100.0
-    downs = [mid * (1 - i * step) for i in range(1, levels+1)]
-    downs_tp = [p * (1 + tp) for p in downs]
-    ups = [mid * (1 + i * step) for i in range(1, levels+1)]
-    ups_tp = [p * (1 - tp) for p in ups]
+    i = np.arange(1, levels + 1, dtype=float)
+    downs = mid * (1 - i * step)
+    downs_tp = downs * (1 + tp)
+    ups = mid * (1 + i * step)
+    ups_tp = ups * (1 - tp)
+    if quantizer is not None:
+        downs = quantizer.prices(downs, "BUY")
+        downs_tp = quantizer.prices(downs_tp, "SELL")
+        ups = quantizer.prices(ups, "SELL")
+        ups_tp = quantizer.prices(ups_tp, "BUY")
     return BothSidesGrid(longs=GridSide(entries=downs, tps=downs_tp),
                          shorts=GridSide(entries=ups, tps=ups_tp))
@@ -0,0 +1,110 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.bot.engine.grid import BothSidesGrid
+
+@dataclass
+class GridOrder:
+    level: int            # 0-based level index within its side
+    book: str             # "long" or "short" grid side
+    role: str             # "entry" or "tp"
+    side: str             # BUY / SELL
+    price: float
+    qty: float
+    reduce_only: bool = False
+    order_id: Optional[int] = None
+
+    def key(self) -> Tuple[str, float, float, bool]:
+        return (self.side, round(self.price, 10), round(self.qty, 10), self.reduce_only)
+
+@dataclass
+class GridSnapshot:
+    symbol: str
+    mid: float
+    levels: int
+    step_pct: float
+    tp_pct: float
+    qty: float
+    orders: List[GridOrder] = field(default_factory=list)
+    guard_ids: Dict[str, int] = field(default_factory=dict)  # side -> resting STOP_MARKET closePosition id
+
+    def save(self, path: str):
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(self), indent=1))
+        os.replace(tmp, p)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["GridSnapshot"]:
+        try:
+            raw = json.loads(Path(path).read_text())
+        except (OSError, ValueError):
+            return None
+        raw["orders"] = [GridOrder(**o) for o in raw.get("orders", [])]
+        return cls(**raw)
+
+    def matches(self, symbol: str, levels: int, step_pct: float, tp_pct: float, qty: float) -> bool:
+        return (self.symbol, self.levels, self.step_pct, self.tp_pct, round(self.qty, 10)) == \
+               (symbol, levels, step_pct, tp_pct, round(qty, 10))
+
+def desired_orders(grid: BothSidesGrid, qty: float) -> List[GridOrder]:
+    """The full grid as orders: BUY entry + reduce-only SELL TP below mid, mirrored above."""
+    out = []
+    for i, (e, t) in enumerate(zip(grid.longs.entries.tolist(), grid.longs.tps.tolist())):
+        out.append(GridOrder(i, "long", "entry", "BUY", e, qty))
+        out.append(GridOrder(i, "long", "tp", "SELL", t, qty, reduce_only=True))
+    for i, (e, t) in enumerate(zip(grid.shorts.entries.tolist(), grid.shorts.tps.tolist())):
+        out.append(GridOrder(i, "short", "entry", "SELL", e, qty))
+        out.append(GridOrder(i, "short", "tp", "BUY", t, qty, reduce_only=True))
+    return out
+
+def _open_key(o: dict) -> Tuple[str, float, float, bool]:
+    return (o["side"], round(float(o["price"]), 10), round(float(o["origQty"]), 10), bool(o.get("reduceOnly")))
+
+def plan_restart(desired: List[GridOrder], previous: List[GridOrder],
+                 open_orders: List[dict]) -> Tuple[List[GridOrder], List[int], List[GridOrder]]:
+    """Diff the live book against the desired grid.
+
+    Returns ``(kept, cancel_ids, to_place)``. Open orders are matched to desired ones by the order id
+    recorded in the previous snapshot, then by (side, price, qty, reduceOnly). A level whose entry is
+    gone but whose TP still rests has a filled entry (open position), so its entry is not re-placed.
+    """
+    prev_ids = {o.order_id: o for o in previous if o.order_id is not None}
+    by_id = {o["orderId"]: o for o in open_orders}
+    unmatched = dict(by_id)
+    slots = {(o.book, o.level, o.role): o for o in desired}
+    kept = {}
+
+    # Pass 1: ids we placed ourselves and still want
+    for oid, prev in prev_ids.items():
+        want = slots.get((prev.book, prev.level, prev.role))
+        if oid in unmatched and want is not None and want.key() == _open_key(unmatched[oid]):
+            kept[(want.book, want.level, want.role)] = GridOrder(**{**asdict(want), "order_id": oid})
+            del unmatched[oid]
+
+    # Pass 2: anything else on the book that is identical to a still-missing desired order
+    by_key = {}
+    for oid, o in unmatched.items():
+        by_key.setdefault(_open_key(o), []).append(oid)
+    for slot, want in slots.items():
+        if slot in kept:
+            continue
+        ids = by_key.get(want.key())
+        if ids:
+            oid = ids.pop(0)
+            kept[slot] = GridOrder(**{**asdict(want), "order_id": oid})
+            del unmatched[oid]
+
+    to_place = []
+    for slot, want in slots.items():
+        if slot in kept:
+            continue
+        book, level, role = slot
+        if role == "entry" and (book, level, "tp") in kept:
+            continue  # entry filled, TP still working: position is open
+        to_place.append(want)
+    return list(kept.values()), list(unmatched), to_place
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from src.bot.engine.book import LevelBook
+from src.bot.engine.state import GridOrder
+from src.bot.exchange.binance import BinanceUM
+from src.bot.exchange.user_stream import UserDataStream
+
+RESYNC_RETRY_SEC = 30.0  # after a failed resync, try again this often until one succeeds
+
+class FillTracker:
+    """Re-arms grid levels from user-data stream fills: entry filled without a resting TP -> TP
+    placed (``place_tps``), TP filled -> entry back on the book (``rearm_entries``). REST is only
+    used to place those orders (plus one open-orders call after a stream reconnect)."""
+
+    def __init__(self, um: BinanceUM, symbol: str, book: LevelBook, state_path: str, ws_url: str,
+                 place_tps: bool = True, rearm_entries: bool = True,
+                 on_guard: Optional[Callable[[dict], None]] = None, resync_retry_sec: float = RESYNC_RETRY_SEC):
+        self.um = um
+        self.place_tps = place_tps
+        self.rearm_entries = rearm_entries
+        self.on_guard = on_guard
+        self.symbol = symbol
+        self.book = book
+        self.state_path = state_path
+        self.ws_url = ws_url
+        self.lock = threading.Lock()
+        self.resync_retry_sec = resync_retry_sec
+        self.resync_due = False
+        self.log = logging.getLogger("fgrid.tracker")
+
+    def place(self, orders: List[GridOrder]):
+        """Place ``orders`` and any follow-ups. Orders that are rejected, or whose request raises,
+        stay marked in the book and are placed again by the next ``on_reconnect``."""
+        while orders:
+            with self.lock:
+                self.book.on_placing(orders)
+            results = self.um.place_limits(self.symbol, [{"side": o.side, "qty": o.qty, "price": o.price,
+                                                          "reduce_only": o.reduce_only} for o in orders], dry=False)
+            follow_up = []
+            with self.lock:
+                for o, r in zip(orders, results):
+                    if r.get("orderId") is None:
+                        self.log.warning(f"re-arm of {o.book} L{o.level} {o.role} {o.side} @ {o.price} failed "
+                                         f"({r.get('code')} {r.get('msg')}), retrying at the next resync")
+                    else:
+                        self.log.info(f"re-armed {o.book} L{o.level} {o.role} {o.side} @ {o.price} -> {r['orderId']}")
+                    follow_up.extend(self.book.on_placed(o, r.get("orderId")))
+                self.book.snapshot().save(self.state_path)
+            orders = follow_up
+
+    def handle(self, ev: dict) -> List[GridOrder]:
+        """Apply one user-data event to the book; returns the orders to place (TPs only with
+        ``place_tps``, entries only with ``rearm_entries``)."""
+        todo = []
+        if ev.get("e") == "ORDER_TRADE_UPDATE" and ev["o"].get("s") == self.symbol \
+                and ev["o"].get("i") in self.book.snap.guard_ids.values():
+            if ev["o"].get("X") == "FILLED" and self.on_guard:
+                self.on_guard(ev["o"])
+            return []
+        with self.lock:
+            if ev.get("e") == "ORDER_TRADE_UPDATE" and ev["o"].get("s") == self.symbol:
+                todo = self.book.on_order_update(ev["o"])
+            elif ev.get("e") == "ACCOUNT_UPDATE":
+                self.book.on_account_update(ev.get("a", {}), self.symbol)
+        return self._wanted(todo)
+
+    def _wanted(self, orders: List[GridOrder]) -> List[GridOrder]:
+        return [o for o in orders if (self.place_tps if o.role == "tp" else self.rearm_entries)]
+
+    def on_event(self, ev: dict):
+        todo = self.handle(ev)
+        if todo:
+            asyncio.get_running_loop().run_in_executor(None, self.place, todo).add_done_callback(self._placed)
+
+    def _placed(self, fut: asyncio.Future):
+        if not fut.cancelled() and fut.exception() is not None:
+            self.log.error(f"re-arm failed, levels left for the next resync: {fut.exception()!r}")
+
+    def on_reconnect(self):
+        """Resync with the open orders after a stream gap. A REST failure is logged and the resync
+        retried every ``resync_retry_sec`` instead of tearing down the stream session."""
+        try:
+            open_orders = self.um.get_open_orders(self.symbol)
+            with self.lock:
+                todo = self._wanted(self.book.reconcile(open_orders))
+            if todo:
+                self.place(todo)
+        except Exception as e:
+            self.resync_due = True
+            self.log.warning(f"resync failed ({e!r}), retrying in {self.resync_retry_sec:g}s")
+            return
+        self.resync_due = False
+
+    async def _retry_resync(self):
+        while True:
+            await asyncio.sleep(self.resync_retry_sec)
+            if self.resync_due:
+                await asyncio.to_thread(self.on_reconnect)
+
+    async def run(self):
+        retry = asyncio.create_task(self._retry_resync())
+        try:
+            await UserDataStream(self.um, base_url=self.ws_url).run(self.on_event, self.on_reconnect)
+        finally:
+            retry.cancel()
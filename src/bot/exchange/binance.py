@@ -1,32 +1,76 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, ROUND_DOWN, ROUND_UP
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from binance.um_futures import UMFutures
+from requests.adapters import HTTPAdapter
+
+from src.bot.exchange.filters import FILTER_ERROR_CODES, ExchangeInfoCache, Quantizer, SymbolFilters
+from src.bot.exchange.ratelimit import ENDPOINT_WEIGHTS, WeightBudget
+from src.bot.utils.metrics import Metrics
+
+BATCH_SIZE = 5  # max orders per /fapi/v1/batchOrders request
+CANCEL_BATCH_SIZE = 10  # max ids per DELETE /fapi/v1/batchOrders
 
 class BinanceUM:
-    def __init__(self, key: str, secret: str):
+    def __init__(self, key: str, secret: str, budget: Optional[WeightBudget] = None, pool_size: int = 0,
+                 client=None, metrics: Optional[Metrics] = None):
         self.log = logging.getLogger("fgrid.binance")
-        self.client = UMFutures(key=key, secret=secret)
+        # show_limit_usage wraps every response as {"limit_usage": {...}, "data": ...}
+        self.client = client or UMFutures(key=key, secret=secret, show_limit_usage=True)
+        if pool_size and client is None:
+            # requests keeps 10 connections per host by default; size it for many concurrent grids
+            self.client.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.budget = budget or WeightBudget()
+        self.metrics = metrics or Metrics()
+        self.metrics.gauges("fgrid_rate_limit", self.budget.snapshot)
+        self.filters_cache = ExchangeInfoCache(lambda: self._call("exchange_info"))
+        self._quantizers = {}
+
+    def _call(self, endpoint: str, *args, orders: int = 0, weight: Optional[int] = None, **kwargs):
+        """Every REST call goes through here: wait for budget, call, sync with the server's usage."""
+        self.budget.acquire(ENDPOINT_WEIGHTS.get(endpoint, 1) if weight is None else weight, orders)
+        try:
+            with self.metrics.timer("fgrid_rest_latency_seconds", endpoint=endpoint):
+                res = getattr(self.client, endpoint)(*args, **kwargs)
+        except Exception as e:
+            code = getattr(e, "error_code", None) or getattr(e, "status_code", None) or type(e).__name__
+            self.metrics.inc("fgrid_rest_errors_total", endpoint=endpoint, code=code)
+            if getattr(e, "status_code", None) in (418, 429):
+                self.metrics.inc("fgrid_rate_limited_total")
+                retry_after = (getattr(e, "header", None) or {}).get("Retry-After")
+                self.budget.back_off(float(retry_after) if retry_after else None)
+            raise
+        if isinstance(res, dict) and "limit_usage" in res:
+            self.budget.sync(res["limit_usage"] or {})
+            res = res["data"]
+        return res
+
+    def rate_limit_metrics(self) -> dict:
+        return self.budget.snapshot()
 
     def price(self, symbol: str) -> float:
-        t = self.client.ticker_price(symbol)
+        t = self._call("ticker_price", symbol)
         return float(t["price"])
 
+    def prices(self) -> Dict[str, float]:
+        """Every symbol's last price in one call (weight 2)."""
+        return {t["symbol"]: float(t["price"]) for t in self._call("ticker_price", weight=2)}
+
+    def symbol_filters(self, symbol: str) -> SymbolFilters:
+        return self.filters_cache.get(symbol)
+
     def exchange_filters(self, symbol: str) -> Tuple[float, float, float, Optional[float]]:
-        info = self.client.exchange_info()
-        for s in info["symbols"]:
-            if s["symbol"] == symbol:
-                fs = {f["filterType"]: f for f in s["filters"]}
-                tick = float(fs["PRICE_FILTER"]["tickSize"])
-                step = float(fs["LOT_SIZE"]["stepSize"])
-                min_qty = float(fs["LOT_SIZE"]["minQty"])
-                min_notional = None
-                if "MIN_NOTIONAL" in fs:
-                    # Futures MIN_NOTIONAL is sometimes present; guard so small orders do not get rejected
-                    min_notional = float(fs["MIN_NOTIONAL"]["notional"])
-                return tick, step, min_qty, min_notional
-        raise RuntimeError("Symbol not found in exchange_info")
+        f = self.symbol_filters(symbol)
+        return f.tick, f.step, f.min_qty, f.min_notional
+
+    def quantizer(self, symbol: str) -> Quantizer:
+        f = self.symbol_filters(symbol)
+        q = self._quantizers.get(symbol)
+        if q is None or q.filters != f:
+            q = self._quantizers[symbol] = Quantizer(f)
+        return q
 
     @staticmethod
     def _quantize(value: float, step: float, rounding) -> float:
@@ -58,13 +102,13 @@ class BinanceUM:
 
     def set_isolated(self, symbol: str, isolated: bool=True):
         try:
-            self.client.change_margin_type(symbol=symbol, marginType="ISOLATED" if isolated else "CROSSED")
+            self._call("change_margin_type", symbol=symbol, marginType="ISOLATED" if isolated else "CROSSED")
         except Exception as e:
             self.log.info(f"margin_type: {e}")
 
     def set_leverage(self, symbol: str, leverage: int=1):
         try:
-            self.client.change_leverage(symbol=symbol, leverage=leverage)
+            self._call("change_leverage", symbol=symbol, leverage=leverage)
         except Exception as e:
             self.log.info(f"leverage: {e}")
 
@@ -72,16 +116,100 @@ class BinanceUM:
         if dry:
             self.log.info(f"[DRY] cancel all {symbol}")
             return []
-        return self.client.cancel_open_orders(symbol=symbol)
+        return self._call("cancel_open_orders", symbol=symbol)
+
+    def cancel_orders(self, symbol: str, order_ids: List[int], dry: bool=True) -> List[dict]:
+        """Cancel specific orders, 10 ids per batch request."""
+        if dry:
+            self.log.info(f"[DRY] cancel {len(order_ids)} orders {symbol}")
+            return []
+        out = []
+        for i in range(0, len(order_ids), CANCEL_BATCH_SIZE):
+            out.extend(self._call("cancel_batch_order", symbol=symbol,
+                                  orderIdList=order_ids[i:i + CANCEL_BATCH_SIZE], origClientOrderIdList=[]))
+        return out
+
+    @staticmethod
+    def _limit_params(symbol: str, side: str, qty: float, price: float, reduce_only: bool) -> dict:
+        return dict(symbol=symbol, side=side, type="LIMIT", quantity=str(qty),
+                    price=f"{price:.8f}", timeInForce="GTC",
+                    reduceOnly="true" if reduce_only else "false",
+                    newOrderRespType="RESULT")
 
     def place_limit(self, symbol: str, side: str, qty: float, price: float, reduce_only: bool=False, dry: bool=True):
         if dry:
             self.log.info(f"[DRY] LIMIT {side} {qty} {symbol} @ {price} reduceOnly={reduce_only}")
             return {"orderId":"DRY"}
-        return self.client.new_order(symbol=symbol, side=side, type="LIMIT", quantity=str(qty),
-                                     price=f"{price:.8f}", timeInForce="GTC",
-                                     reduceOnly="true" if reduce_only else "false",
-                                     newOrderRespType="RESULT")
+        return self._call("new_order", orders=1, **self._limit_params(symbol, side, qty, price, reduce_only))
+
+    def place_stop_close(self, symbol: str, side: str, stop_price: float, dry: bool=True):
+        """Exchange-side guard: STOP_MARKET that closes the whole position when mark price hits ``stop_price``."""
+        if dry:
+            self.log.info(f"[DRY] STOP_MARKET {side} closePosition {symbol} @ {stop_price}")
+            return {"orderId": "DRY"}
+        return self._call("new_order", orders=1, symbol=symbol, side=side, type="STOP_MARKET",
+                          stopPrice=f"{stop_price:.8f}", closePosition="true", workingType="MARK_PRICE",
+                          newOrderRespType="RESULT")
+
+    def _place_batch(self, batch: List[dict]) -> List[dict]:
+        try:
+            res = self._call("new_batch_order", orders=len(batch), batchOrders=batch)
+        except Exception as e:
+            # The whole request failed: report it against every order in the batch
+            return [{"code": getattr(e, "error_code", -1), "msg": str(e)} for _ in batch]
+        return list(res)
+
+    def place_limits(self, symbol: str, orders: List[dict], dry: bool=True, max_workers: int=4) -> List[dict]:
+        """Place many LIMIT orders via batchOrders (5 per request), sending batches concurrently.
+
+        ``orders`` are dicts with ``side``, ``qty``, ``price`` and optional ``reduce_only``.
+        Returns one result per order in the same order; rejected orders carry ``code``/``msg``.
+        """
+        params = [self._limit_params(symbol, o["side"], o["qty"], o["price"], o.get("reduce_only", False))
+                  for o in orders]
+        if dry:
+            for p in params:
+                self.log.info(f"[DRY] LIMIT {p['side']} {p['quantity']} {symbol} @ {p['price']} "
+                              f"reduceOnly={p['reduceOnly']}")
+            return [{"orderId": "DRY"} for _ in params]
+
+        results = self._send_batches(params, max_workers)
+
+        # Refresh-on-reject: a filter error means tick/lot size changed; re-round once and resend
+        stale = [i for i, r in enumerate(results) if r.get("code") in FILTER_ERROR_CODES]
+        if stale:
+            self.log.warning(f"{len(stale)} orders hit filter errors; refreshing exchange_info")
+            self.metrics.inc("fgrid_order_retries_total", len(stale))
+            self.filters_cache.invalidate()
+            q = self.quantizer(symbol)
+            for i in stale:
+                o = orders[i]
+                price = float(q.prices([o["price"]], o["side"])[0])
+                qty = float(q.qtys([o["qty"]], [price])[0])
+                params[i] = self._limit_params(symbol, o["side"], qty, price, o.get("reduce_only", False))
+            for i, r in zip(stale, self._send_batches([params[i] for i in stale], max_workers)):
+                results[i] = r
+
+        failed = [(p, r) for p, r in zip(params, results) if "code" in r and "orderId" not in r]
+        for p, r in failed:
+            self.metrics.inc("fgrid_orders_rejected_total", code=r.get("code"))
+            self.log.warning(f"order rejected {p['side']} {p['quantity']} @ {p['price']}: {r.get('code')} {r.get('msg')}")
+        if failed:
+            self.log.warning(f"{len(failed)}/{len(params)} orders failed")
+        return results
+
+    def _send_batches(self, params: List[dict], max_workers: int) -> List[dict]:
+        batches = [params[i:i + BATCH_SIZE] for i in range(0, len(params), BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return [r for rs in pool.map(self._place_batch, batches) for r in rs]
+
+    def new_listen_key(self) -> str:
+        return self._call("new_listen_key")["listenKey"]
+
+    def renew_listen_key(self, listen_key: str):
+        return self._call("renew_listen_key", listenKey=listen_key)
 
     def get_open_orders(self, symbol: str):
-        return self.client.get_open_orders(symbol=symbol)
+        # GET /fapi/v1/openOrders is the connector's get_orders; its get_open_orders is the single-order
+        # /fapi/v1/openOrder query and requires an orderId
+        return self._call("get_orders", symbol=symbol)
@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.getenv("EXCHANGE_INFO_CACHE", os.path.join("data", "exchange_info.json"))
+DEFAULT_TTL_SEC = 3600.0
+
+# Order rejections that mean our cached filters are stale
+FILTER_ERROR_CODES = {-1013, -1111, -4014, -4023, -4164}
+
+@dataclass(frozen=True)
+class SymbolFilters:
+    symbol: str
+    tick: float
+    step: float
+    min_qty: float
+    min_notional: Optional[float] = None
+
+    @classmethod
+    def from_symbol_info(cls, s: dict) -> "SymbolFilters":
+        fs = {f["filterType"]: f for f in s["filters"]}
+        min_notional = None
+        if "MIN_NOTIONAL" in fs:
+            # Futures MIN_NOTIONAL is sometimes present; guard so small orders do not get rejected
+            min_notional = float(fs["MIN_NOTIONAL"]["notional"])
+        return cls(symbol=s["symbol"], tick=float(fs["PRICE_FILTER"]["tickSize"]),
+                   step=float(fs["LOT_SIZE"]["stepSize"]), min_qty=float(fs["LOT_SIZE"]["minQty"]),
+                   min_notional=min_notional)
+
+class ExchangeInfoCache:
+    """Per-symbol filters cached in memory and on disk with a TTL.
+
+    Only the compact filter fields are persisted, not the full exchange_info payload. Safe to share
+    between threads: concurrent ``get`` calls on a stale cache wait for one download.
+    """
+
+    def __init__(self, fetch: Callable[[], dict], path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL_SEC):
+        self.fetch = fetch
+        self.path = Path(path)
+        self.ttl = ttl
+        self.fetched_at = 0.0
+        self.symbols: Dict[str, SymbolFilters] = {}
+        self.lock = threading.Lock()
+        self.log = logging.getLogger("fgrid.filters")
+
+    def _load_disk(self):
+        try:
+            raw = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return
+        self.fetched_at = float(raw.get("fetched_at", 0))
+        self.symbols = {k: SymbolFilters(**v) for k, v in raw.get("symbols", {}).items()}
+
+    def _save_disk(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # A unique temp name, so other processes sharing the file never write over our half-written one
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp",
+                                         delete=False) as f:
+            json.dump({"fetched_at": self.fetched_at, "symbols": {k: asdict(v) for k, v in self.symbols.items()}}, f)
+        try:
+            os.replace(f.name, self.path)
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+    def refresh(self):
+        with self.lock:
+            self._refresh()
+
+    def _refresh(self):
+        info = self.fetch()
+        symbols = {}
+        for s in info["symbols"]:
+            try:
+                symbols[s["symbol"]] = SymbolFilters.from_symbol_info(s)
+            except KeyError:
+                continue  # symbol without the filters we trade on
+        self.symbols, self.fetched_at = symbols, time.time()
+        self._save_disk()
+        self.log.info(f"exchange_info refreshed ({len(symbols)} symbols)")
+
+    def get(self, symbol: str) -> SymbolFilters:
+        # Check and refresh under one lock: threads arriving while it downloads reuse its result
+        with self.lock:
+            if not self.symbols:
+                self._load_disk()
+            if time.time() - self.fetched_at > self.ttl or symbol not in self.symbols:
+                self._refresh()
+            filters = self.symbols.get(symbol)
+        if filters is None:
+            raise RuntimeError("Symbol not found in exchange_info")
+        return filters
+
+    def invalidate(self):
+        self.fetched_at = 0.0
+
+def public_symbol_filters(symbol: str, path: str = DEFAULT_CACHE_PATH) -> SymbolFilters:
+    """Filters for ``symbol`` from the shared cache, refreshed via the public endpoint (no keys)."""
+    from binance.um_futures import UMFutures
+    return ExchangeInfoCache(UMFutures().exchange_info, path=path).get(symbol)
+
+def _decimal_parts(step: float):
+    """``step == m * 10**-d`` exactly, as integers (m, d) taken from the decimal repr."""
+    t = Decimal(str(step)).as_tuple()
+    m = int("".join(map(str, t.digits)))
+    if t.exponent >= 0:
+        return m * 10 ** t.exponent, 0
+    return m, -t.exponent
+
+class Quantizer:
+    """Vectorized price/qty rounding in integer tick space, built once per symbol.
+
+    Matches ``BinanceUM.round_price``/``round_qty`` (Decimal based) but on whole arrays:
+    a value is divided into ticks and floored/ceiled (values within float error of a tick boundary
+    are compared against the exact boundary), then converted back as ``ticks * m / 10**d`` so
+    results are the same floats the Decimal path produces.
+    """
+
+    def __init__(self, filters: SymbolFilters):
+        self.filters = filters
+        self._tick_m, self._tick_d = _decimal_parts(filters.tick)
+        self._step_m, self._step_d = _decimal_parts(filters.step)
+
+    @staticmethod
+    def _units(values: np.ndarray, m: int, d: int, up: bool) -> np.ndarray:
+        scale = float(10 ** d)
+        k = values / (m / scale)
+        r = np.rint(k)
+        out = np.ceil(k) if up else np.floor(k)
+        # Division error only matters next to an integer: decide those by comparing with the exact multiple
+        near = np.abs(k - r) <= 8 * np.finfo(float).eps * np.abs(r)
+        if near.any():
+            exact = (r * m) / scale
+            at = np.where(values == exact, r, np.where(values > exact, r + 0.5, r - 0.5))
+            out = np.where(near, np.ceil(at) if up else np.floor(at), out)
+        return out.astype(np.int64)
+
+    def price_ticks(self, prices, side: str) -> np.ndarray:
+        """BUY rounds down (better entry), SELL rounds up (better TP), as in ``round_price``."""
+        return self._units(np.asarray(prices, dtype=float), self._tick_m, self._tick_d, up=side.upper() != "BUY")
+
+    def from_ticks(self, ticks: np.ndarray) -> np.ndarray:
+        return (ticks * self._tick_m) / float(10 ** self._tick_d)
+
+    def prices(self, prices, side: str) -> np.ndarray:
+        return self.from_ticks(self.price_ticks(prices, side))
+
+    def qtys(self, qtys, prices=None) -> np.ndarray:
+        """Lot-size floor, then at least minQty and (with ``prices``) minNotional, as in ``round_qty``."""
+        f = self.filters
+        steps = self._units(np.asarray(qtys, dtype=float), self._step_m, self._step_d, up=False)
+        q = np.maximum((steps * self._step_m) / float(10 ** self._step_d), f.min_qty)
+        if f.min_notional and prices is not None:
+            need = self._units(f.min_notional / np.asarray(prices, dtype=float), self._step_m, self._step_d, up=True)
+            q = np.maximum(q, (need * self._step_m) / float(10 ** self._step_d))
+        return q
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+# USD-M REST weights of the endpoints BinanceUM uses (UMFutures method name -> IP weight)
+ENDPOINT_WEIGHTS = {
+    "exchange_info": 1,
+    "ticker_price": 1,
+    "new_order": 0,          # orders count against the order limits instead
+    "new_batch_order": 5,
+    "cancel_open_orders": 1,
+    "cancel_batch_order": 1,
+    "get_orders": 1,         # all open orders, with symbol; 40 without
+    "change_margin_type": 1,
+    "change_leverage": 1,
+    "new_listen_key": 1,
+    "renew_listen_key": 1,
+}
+
+WEIGHT_PER_MIN = 2400
+ORDERS_PER_10S = 300
+ORDERS_PER_MIN = 1200
+
+class _Bucket:
+    def __init__(self, capacity: float, period: float, now: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.used = 0
+        self.stamp = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_for(self, n: float) -> float:
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    def sync_used(self, used: int):
+        # The server counts a fixed window; never believe we have more left than it reports.
+        # ``used`` is raw server usage: it counts in full against our (headroom-scaled) capacity.
+        self.used = used
+        self.tokens = min(self.tokens, max(0.0, self.capacity - used))
+
+class WeightBudget:
+    """Thread-safe token buckets for request weight and order counts.
+
+    ``acquire`` blocks until a call fits; ``sync`` clamps the buckets to the usage the server reports
+    in ``X-MBX-USED-WEIGHT-1M`` / ``X-MBX-ORDER-COUNT-*``. ``headroom`` < 1 leaves part of the IP
+    limit to other processes sharing it. ``clock`` provides ``monotonic()``/``sleep()`` (the ``time``
+    module, or a virtual clock in replays).
+    """
+
+    def __init__(self, headroom: float = 0.8, clock=time):
+        self.headroom = headroom
+        self.clock = clock
+        now = clock.monotonic()
+        self.weight = _Bucket(WEIGHT_PER_MIN * headroom, 60.0, now)
+        self.orders_10s = _Bucket(ORDERS_PER_10S * headroom, 10.0, now)
+        self.orders_1m = _Bucket(ORDERS_PER_MIN * headroom, 60.0, now)
+        self.blocked_until = 0.0
+        self.waits = 0
+        self.waited_sec = 0.0
+        self.lock = threading.Lock()
+        self.log = logging.getLogger("fgrid.ratelimit")
+
+    def _buckets(self):
+        return (self.weight, self.orders_10s, self.orders_1m)
+
+    def acquire(self, weight: int, orders: int = 0):
+        while True:
+            with self.lock:
+                now = self.clock.monotonic()
+                for b in self._buckets():
+                    b.refill(now)
+                wait = max(self.blocked_until - now,
+                           self.weight.wait_for(weight),
+                           self.orders_10s.wait_for(orders),
+                           self.orders_1m.wait_for(orders))
+                if wait <= 0:
+                    self.weight.tokens -= weight
+                    self.orders_10s.tokens -= orders
+                    self.orders_1m.tokens -= orders
+                    return
+                self.waits += 1
+                self.waited_sec += wait
+            self.log.info(f"rate limit: delaying call {wait:.2f}s")
+            self.clock.sleep(wait)
+
+    def sync(self, headers: Dict[str, str]):
+        h = {k.lower(): v for k, v in headers.items()}
+        with self.lock:
+            now = self.clock.monotonic()
+            for b in self._buckets():
+                b.refill(now)
+            if "x-mbx-used-weight-1m" in h:
+                self.weight.sync_used(int(h["x-mbx-used-weight-1m"]))
+            if "x-mbx-order-count-10s" in h:
+                self.orders_10s.sync_used(int(h["x-mbx-order-count-10s"]))
+            if "x-mbx-order-count-1m" in h:
+                self.orders_1m.sync_used(int(h["x-mbx-order-count-1m"]))
+
+    def back_off(self, seconds: Optional[float]):
+        """After a 429/418: stop all calls for ``Retry-After`` seconds (60 if unknown)."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock.monotonic() + (seconds or 60.0))
+        self.log.warning(f"rate limited by server, pausing {seconds or 60.0:.0f}s")
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current headroom (tokens left) per limit plus wait counters."""
+        with self.lock:
+            now = self.clock.monotonic()
+            for b in self._buckets():
+                b.refill(now)
+            return {
+                "weight_headroom": self.weight.tokens,
+                "orders_10s_headroom": self.orders_10s.tokens,
+                "orders_1m_headroom": self.orders_1m.tokens,
+                "blocked_for_sec": max(0.0, self.blocked_until - now),
+                "waits": self.waits,
+                "waited_sec": self.waited_sec,
+            }
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Iterable, Optional
+
+import aiohttp
+
+WS_BASE = "wss://fstream.binance.com"
+
+def parse_price(msg: dict) -> Optional[float]:
+    """Price from a markPrice or bookTicker event (raw or combined-stream envelope)."""
+    data = msg.get("data", msg)
+    if "p" in data and data.get("e") == "markPriceUpdate":
+        return float(data["p"])
+    if "b" in data and "a" in data:
+        return (float(data["b"]) + float(data["a"])) / 2.0
+    return None
+
+def _stream_name(symbol: str, kind: str) -> str:
+    if kind not in ("markPrice", "bookTicker"):
+        raise ValueError(f"Unsupported price stream: {kind}")
+    return f"{symbol.lower()}@{'markPrice@1s' if kind == 'markPrice' else 'bookTicker'}"
+
+class PriceStream:
+    """Futures market-data WebSocket for one symbol with reconnect + exponential backoff.
+
+    ``connected`` is set while messages are flowing so callers can fall back to REST otherwise.
+    """
+
+    def __init__(self, symbol: str, kind: str = "markPrice", base_url: str = WS_BASE,
+                 max_backoff: float = 30.0, session: Optional[aiohttp.ClientSession] = None):
+        self.url = f"{base_url.rstrip('/')}/ws/{_stream_name(symbol, kind)}"
+        self.max_backoff = max_backoff
+        self.session = session
+        self.connected = asyncio.Event()
+        self.log = logging.getLogger("fgrid.stream")
+
+    def _dispatch(self, msg: dict, on_price: Callable) -> bool:
+        p = parse_price(msg)
+        if p is None:
+            return False
+        on_price(p)
+        return True
+
+    async def run(self, on_price: Callable[[float], None]):
+        """Forever: connect, push every price to ``on_price``, reconnect on failure. Cancel to stop."""
+        own = self.session is None
+        session = self.session or aiohttp.ClientSession()
+        backoff = 1.0
+        try:
+            while True:
+                try:
+                    async with session.ws_connect(self.url, heartbeat=20) as ws:
+                        self.log.info(f"stream connected {self.url}")
+                        async for m in ws:
+                            if m.type != aiohttp.WSMsgType.TEXT:
+                                if m.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                                    break
+                                continue
+                            if not self._dispatch(json.loads(m.data), on_price):
+                                continue
+                            self.connected.set()
+                            backoff = 1.0
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    self.log.warning(f"stream error: {e}")
+                self.connected.clear()
+                self.log.warning(f"stream down, reconnecting in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            self.connected.clear()
+            if own:
+                await session.close()
+
+class MultiPriceStream(PriceStream):
+    """One combined-stream connection for many symbols; ``run`` calls ``on_price(symbol, price)``."""
+
+    def __init__(self, symbols: Iterable[str], kind: str = "markPrice", base_url: str = WS_BASE,
+                 max_backoff: float = 30.0, session: Optional[aiohttp.ClientSession] = None):
+        symbols = list(symbols)
+        if not symbols:
+            raise ValueError("MultiPriceStream needs at least one symbol")
+        super().__init__(symbols[0], kind, base_url, max_backoff, session)
+        streams = "/".join(_stream_name(s, kind) for s in symbols)
+        self.url = f"{base_url.rstrip('/')}/stream?streams={streams}"
+
+    def _dispatch(self, msg: dict, on_price: Callable) -> bool:
+        p = parse_price(msg)
+        symbol = msg.get("data", msg).get("s")
+        if p is None or symbol is None:
+            return False
+        on_price(symbol, p)
+        return True
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Optional
+
+import aiohttp
+
+from src.bot.exchange.binance import BinanceUM
+from src.bot.exchange.stream import WS_BASE
+
+KEEPALIVE_SEC = 30 * 60  # listenKey expires after 60 min without a keepalive
+
+class UserDataStream:
+    """Futures user-data stream: listenKey + keepalive, reconnect with backoff.
+
+    ``on_event`` gets every decoded event; ``on_reconnect`` runs after each reconnect (not the first
+    connect) so the caller can reconcile anything missed during the gap.
+    """
+
+    def __init__(self, um: BinanceUM, base_url: str = WS_BASE, keepalive_sec: float = KEEPALIVE_SEC,
+                 max_backoff: float = 30.0, session: Optional[aiohttp.ClientSession] = None):
+        self.um = um
+        self.base_url = base_url.rstrip("/")
+        self.keepalive_sec = keepalive_sec
+        self.max_backoff = max_backoff
+        self.session = session
+        self.connected = asyncio.Event()
+        self.log = logging.getLogger("fgrid.userstream")
+
+    async def _keepalive(self, key: str):
+        while True:
+            await asyncio.sleep(self.keepalive_sec)
+            try:
+                await asyncio.to_thread(self.um.renew_listen_key, key)
+            except Exception as e:
+                self.log.warning(f"listenKey keepalive failed: {e}")
+
+    async def run(self, on_event: Callable[[dict], None], on_reconnect: Optional[Callable[[], None]] = None):
+        own = self.session is None
+        session = self.session or aiohttp.ClientSession()
+        backoff, first = 1.0, True
+        try:
+            while True:
+                keepalive = None
+                try:
+                    key = await asyncio.to_thread(self.um.new_listen_key)
+                    async with session.ws_connect(f"{self.base_url}/ws/{key}", heartbeat=20) as ws:
+                        self.connected.set()
+                        self.log.info("user-data stream connected")
+                        keepalive = asyncio.create_task(self._keepalive(key))
+                        if not first and on_reconnect:
+                            await asyncio.to_thread(on_reconnect)
+                        first, backoff = False, 1.0
+                        async for m in ws:
+                            if m.type != aiohttp.WSMsgType.TEXT:
+                                if m.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                                    break
+                                continue
+                            ev = json.loads(m.data)
+                            if ev.get("e") == "listenKeyExpired":
+                                self.log.warning("listenKey expired, reconnecting")
+                                break
+                            on_event(ev)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.log.warning(f"user-data stream error: {e}")
+                finally:
+                    if keepalive:
+                        keepalive.cancel()
+                self.connected.clear()
+                self.log.warning(f"user-data stream down, reconnecting in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+        finally:
+            self.connected.clear()
+            if own:
+                await session.close()
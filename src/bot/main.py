@@ -1,61 +1,242 @@
+import asyncio
+import os
 import time
+from typing import Callable, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 from src.bot.utils.logging import setup_logger
 from src.bot.utils.config import Settings
+from src.bot.utils.metrics import start_exporters
 from src.bot.exchange.binance import BinanceUM
+from src.bot.exchange.ratelimit import WeightBudget
+from src.bot.exchange.stream import PriceStream
 from src.bot.engine.grid import build_both_sides
+from src.bot.engine.book import LevelBook
+from src.bot.engine.state import GridOrder, GridSnapshot, desired_orders, plan_restart
+from src.bot.engine.tracker import FillTracker
 
-def main():
-    load_dotenv()
-    log = setup_logger("fgrid")
-    cfg = Settings()
-    cfg.validate()
+async def watch_breakout(um: BinanceUM, cfg: Settings, low: float, high: float, log) -> float:
+    """Check the guard on every stream tick; poll REST only while the stream is down.
+    Returns the breakout price."""
+    hit = asyncio.get_running_loop().create_future()
 
-    um = BinanceUM(cfg.api_key, cfg.api_secret)
-    um.set_isolated(cfg.symbol, cfg.isolated)
-    um.set_leverage(cfg.symbol, leverage=1)
+    def check(p: float):
+        if (p < low or p > high) and not hit.done():
+            um.metrics.mark(f"breakout:{cfg.symbol}")
+            hit.set_result(p)
 
-    tick, step, min_qty, min_notional = um.exchange_filters(cfg.symbol)
+    stream = PriceStream(cfg.symbol, kind=cfg.price_stream, base_url=cfg.ws_url)
 
-    mid = um.price(cfg.symbol)
-    grid = build_both_sides(mid, cfg.grid_levels, cfg.step_pct, cfg.tp_pct)
+    async def rest_fallback():
+        while True:
+            if not stream.connected.is_set():
+                try:
+                    check(await asyncio.to_thread(um.price, cfg.symbol))
+                except Exception as e:
+                    log.warning(f"REST price fallback failed: {e}")
+            t0 = time.perf_counter()
+            await asyncio.sleep(cfg.poll_sec)
+            um.metrics.observe("fgrid_loop_lag_seconds", max(0.0, time.perf_counter() - t0 - cfg.poll_sec), loop="poll")
+
+    tasks = [asyncio.create_task(stream.run(check)), asyncio.create_task(rest_fallback())]
+    try:
+        return await hit
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
 
-    notional = cfg.order_usdt * cfg.effective_exposure
-    qty = max(notional / mid, min_qty)
-    qty = um.round_qty(qty, step, min_qty, min_notional=min_notional, price=mid)
+def _drop_state(cfg: Settings):
+    # The grid is gone; a stale snapshot must not be warm-started later
+    if os.path.exists(cfg.state_path):
+        os.remove(cfg.state_path)
 
-    log.info(f"Start BOTH-SIDES GRID {cfg.symbol} mid={mid:.2f} levels/side={cfg.grid_levels} "
-             f"step={cfg.step_pct}% tp={cfg.tp_pct}% qty≈{qty} DRY={cfg.dry_run}")
+def _place(um: BinanceUM, cfg: Settings, orders: List[GridOrder]) -> List[GridOrder]:
+    results = um.place_limits(cfg.symbol, [{"side": o.side, "qty": o.qty, "price": o.price,
+                                           "reduce_only": o.reduce_only} for o in orders], dry=cfg.dry_run)
+    placed = []
+    for o, r in zip(orders, results):
+        if "orderId" in r:
+            o.order_id = r["orderId"]
+            placed.append(o)
+    return placed
 
-    um.cancel_all(cfg.symbol, dry=cfg.dry_run)
+def guard_prices(cfg: Settings, mid: float) -> Tuple[float, float]:
+    return mid * (1 - cfg.max_range_pct/100.0), mid * (1 + cfg.max_range_pct/100.0)
 
-    placed = 0
-    for entry, tp in zip(grid.longs.entries, grid.longs.tps):
-        e = um.round_price(entry, tick, side="BUY"); t = um.round_price(tp, tick, side="SELL")
-        um.place_limit(cfg.symbol, "BUY", qty, e, reduce_only=False, dry=cfg.dry_run)
-        um.place_limit(cfg.symbol, "SELL", qty, t, reduce_only=True, dry=cfg.dry_run)
-        placed += 2
-    for entry, tp in zip(grid.shorts.entries, grid.shorts.tps):
-        e = um.round_price(entry, tick, side="SELL"); t = um.round_price(tp, tick, side="BUY")
-        um.place_limit(cfg.symbol, "SELL", qty, e, reduce_only=False, dry=cfg.dry_run)
-        um.place_limit(cfg.symbol, "BUY", qty, t, reduce_only=True, dry=cfg.dry_run)
-        placed += 2
-
-    low = mid * (1 - cfg.max_range_pct/100.0)
-    high = mid * (1 + cfg.max_range_pct/100.0)
-    log.info(f"Placed {placed} orders. Breakout guard [{low:.2f}, {high:.2f}]")
+def place_guard_stops(um: BinanceUM, cfg: Settings, snap: GridSnapshot, open_ids: Set[int], log):
+    """Rest reduce-only closePosition STOP_MARKETs at the guard prices (keeping any still open)."""
+    low, high = guard_prices(cfg, snap.mid)
+    quant = um.quantizer(cfg.symbol)
+    # SELL stop below closes longs, BUY stop above closes shorts; both rounded towards mid
+    want = {"SELL": float(quant.prices([low], "SELL")[0]), "BUY": float(quant.prices([high], "BUY")[0])}
+    keep = {side: oid for side, oid in snap.guard_ids.items() if oid in open_ids}
+    for side, stop in want.items():
+        if side in keep:
+            continue
+        try:
+            r = um.place_stop_close(cfg.symbol, side, stop, dry=cfg.dry_run)
+            keep[side] = r["orderId"]
+        except Exception as e:
+            log.warning(f"Exchange guard {side} @ {stop} not placed ({e}); relying on the client-side guard")
+    snap.guard_ids = keep
+    log.info(f"Exchange guard stops: {keep}")
 
+def cancel_grid(um: BinanceUM, cfg: Settings, snap: GridSnapshot, log):
+    """Client-side breakout: drop the grid but leave guard stops resting to close the position."""
+    guard = set(snap.guard_ids.values())
+    if not guard or cfg.dry_run:
+        um.cancel_all(cfg.symbol, dry=cfg.dry_run)
+        return
     try:
-        while True:
-            p = um.price(cfg.symbol)
-            if p < low or p > high:
-                log.warning(f"Breakout {p:.2f} — cancel all")
-                um.cancel_all(cfg.symbol, dry=cfg.dry_run)
-                break
-            time.sleep(5)
-    except KeyboardInterrupt:
-        log.info("Interrupted. Cancelling...")
+        ids = [o["orderId"] for o in um.get_open_orders(cfg.symbol) if o["orderId"] not in guard]
+        um.cancel_orders(cfg.symbol, ids, dry=cfg.dry_run)
+    except Exception as e:
+        # The grid must come off the book even if that takes the guard stops with it
+        log.warning(f"Selective cancel failed ({e}); cancelling all open orders, guard stops included")
         um.cancel_all(cfg.symbol, dry=cfg.dry_run)
 
+def _warm_start(um: BinanceUM, cfg: Settings, snap: GridSnapshot, log) -> Optional[Tuple[GridSnapshot, Set[int]]]:
+    """Reuse the resting grid from ``snap``: one open-orders call, then only the diff. None = go cold.
+    Also returns the ids that were open, so resting guard stops can be kept."""
+    quant = um.quantizer(cfg.symbol)
+    qty = float(quant.qtys([cfg.order_usdt * cfg.effective_exposure / snap.mid], [snap.mid])[0])
+    if not snap.matches(cfg.symbol, cfg.grid_levels, cfg.step_pct, cfg.tp_pct, qty):
+        log.info("Warm restart: grid settings changed since the snapshot, starting cold")
+        return None
+    p = um.price(cfg.symbol)
+    if abs(p / snap.mid - 1) * 100.0 > cfg.max_range_pct:
+        log.info(f"Warm restart: price {p:.2f} is outside the snapshot's guard, starting cold")
+        return None
+
+    grid = build_both_sides(snap.mid, cfg.grid_levels, cfg.step_pct, cfg.tp_pct, quantizer=quant)
+    if cfg.dry_run:
+        log.info("[DRY] warm restart assumes every snapshot order is still open")
+        open_orders = [{"orderId": o.order_id, "side": o.side, "price": str(o.price), "origQty": str(o.qty),
+                        "reduceOnly": o.reduce_only} for o in snap.orders]
+        open_orders += [{"orderId": oid} for oid in snap.guard_ids.values()]
+    else:
+        open_orders = um.get_open_orders(cfg.symbol)
+    open_ids = {o["orderId"] for o in open_orders}
+    guard = set(snap.guard_ids.values())
+    kept, cancel_ids, to_place = plan_restart(desired_orders(grid, qty), snap.orders,
+                                              [o for o in open_orders if o["orderId"] not in guard])
+    log.info(f"Warm restart mid={snap.mid:.2f}: keep {len(kept)}, cancel {len(cancel_ids)}, place {len(to_place)}")
+    if cancel_ids:
+        um.cancel_orders(cfg.symbol, cancel_ids, dry=cfg.dry_run)
+    placed = _place(um, cfg, to_place) if to_place else []
+    snap.orders = kept + placed
+    return snap, open_ids
+
+def deploy_grid(um: BinanceUM, cfg: Settings, log) -> GridSnapshot:
+    """Put the grid on the book (warm from the state file when enabled) and persist a snapshot."""
+    t0 = time.perf_counter()
+    prev = GridSnapshot.load(cfg.state_path) if cfg.warm_restart else None
+    warm = _warm_start(um, cfg, prev, log) if prev else None
+    snap, open_ids = warm if warm else (None, set())
+    if snap is None:
+        quant = um.quantizer(cfg.symbol)
+        mid = um.price(cfg.symbol)
+        grid = build_both_sides(mid, cfg.grid_levels, cfg.step_pct, cfg.tp_pct, quantizer=quant)
+        notional = cfg.order_usdt * cfg.effective_exposure
+        qty = float(quant.qtys([notional / mid], [mid])[0])
+
+        log.info(f"Start BOTH-SIDES GRID {cfg.symbol} mid={mid:.2f} levels/side={cfg.grid_levels} "
+                 f"step={cfg.step_pct}% tp={cfg.tp_pct}% qty≈{qty} DRY={cfg.dry_run}")
+        um.cancel_all(cfg.symbol, dry=cfg.dry_run)
+        orders = desired_orders(grid, qty)
+        snap = GridSnapshot(cfg.symbol, mid, cfg.grid_levels, cfg.step_pct, cfg.tp_pct, qty,
+                            orders=_place(um, cfg, orders))
+        log.info(f"Placed {len(snap.orders)}/{len(orders)} orders")
+    if cfg.exchange_guard:
+        place_guard_stops(um, cfg, snap, open_ids, log)
+    snap.save(cfg.state_path)
+    um.metrics.observe("fgrid_deploy_seconds", time.perf_counter() - t0, symbol=cfg.symbol,
+                       mode="warm" if warm else "cold")
+    return snap
+
+def make_tracker(um: BinanceUM, cfg: Settings, snap: GridSnapshot,
+                 on_guard: Optional[Callable[[dict], None]] = None) -> FillTracker:
+    grid = build_both_sides(snap.mid, snap.levels, snap.step_pct, snap.tp_pct, quantizer=um.quantizer(cfg.symbol))
+    book = LevelBook(snap, desired_orders(grid, snap.qty))
+    return FillTracker(um, cfg.symbol, book, cfg.state_path, cfg.ws_url, place_tps=cfg.track_fills,
+                       rearm_entries=cfg.track_fills and cfg.rearm_entries, on_guard=on_guard)
+
+def guard_fill_price(o: dict) -> float:
+    return float(o.get("ap") or o.get("sp") or 0.0)
+
+async def run_live(um: BinanceUM, cfg: Settings, snap: GridSnapshot, low: float, high: float,
+                   log) -> Tuple[float, str]:
+    """Guard + fill tracking on one event loop until breakout.
+    Returns the breakout price and who saw it first: "exchange" (guard stop filled) or "client"."""
+    loop = asyncio.get_running_loop()
+    stop_hit = loop.create_future()
+    tasks = []
+    if (cfg.track_fills or snap.guard_ids) and not cfg.dry_run:
+        def on_guard(o: dict):
+            if not stop_hit.done():
+                um.metrics.mark(f"breakout:{cfg.symbol}")
+                stop_hit.set_result(guard_fill_price(o))
+
+        tasks.append(asyncio.create_task(make_tracker(um, cfg, snap, on_guard).run()))
+    client = asyncio.create_task(watch_breakout(um, cfg, low, high, log))
+    tasks.append(client)
+    try:
+        done, _ = await asyncio.wait([client, stop_hit], return_when=asyncio.FIRST_COMPLETED)
+        if stop_hit in done:
+            return stop_hit.result(), "exchange"
+        return client.result(), "client"
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def close_grid(um: BinanceUM, cfg: Settings, snap: GridSnapshot, p: float, source: str, log):
+    """After a breakout: cancel what is left of the grid and forget the snapshot."""
+    if source == "exchange":
+        log.warning(f"Guard stop filled @ {p:.2f} — position closed on exchange, cancel all")
+        um.cancel_all(cfg.symbol, dry=cfg.dry_run)
+    else:
+        log.warning(f"Breakout {p:.2f} — cancel grid")
+        cancel_grid(um, cfg, snap, log)
+    seen = um.metrics.since(f"breakout:{cfg.symbol}")
+    if seen is not None:
+        um.metrics.observe("fgrid_guard_to_cancel_seconds", seen, symbol=cfg.symbol, source=source)
+        log.info(f"Grid cancelled {seen * 1000:.0f} ms after the breakout was seen")
+    _drop_state(cfg)
+
+def stop_grid(um: BinanceUM, cfg: Settings, log):
+    """On Ctrl-C: leave the grid resting for a warm restart, or cancel it."""
+    if cfg.warm_restart:
+        log.info(f"Interrupted. Leaving the grid resting for a warm restart ({cfg.state_path})")
+        return
+    log.info("Interrupted. Cancelling...")
+    um.cancel_all(cfg.symbol, dry=cfg.dry_run)
+    _drop_state(cfg)
+
+def main():
+    load_dotenv()
+    log = setup_logger("fgrid")
+    cfg = Settings()
+    cfg.validate()
+
+    um = BinanceUM(cfg.api_key, cfg.api_secret, budget=WeightBudget(cfg.rate_limit_headroom))
+    stop_metrics = start_exporters(um.metrics, cfg, log)
+    try:
+        um.set_isolated(cfg.symbol, cfg.isolated)
+        um.set_leverage(cfg.symbol, leverage=1)
+
+        snap = deploy_grid(um, cfg, log)
+        low, high = guard_prices(cfg, snap.mid)
+        log.info(f"Breakout guard [{low:.2f}, {high:.2f}]")
+        log.info(f"Rate limit headroom: {um.rate_limit_metrics()}")
+
+        try:
+            p, source = asyncio.run(run_live(um, cfg, snap, low, high, log))
+            close_grid(um, cfg, snap, p, source, log)
+        except KeyboardInterrupt:
+            stop_grid(um, cfg, log)
+    finally:
+        stop_metrics()
+
 if __name__ == "__main__":
     main()
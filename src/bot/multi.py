@@ -0,0 +1,182 @@
+import argparse
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from src.bot.engine.state import GridSnapshot
+from src.bot.engine.tracker import FillTracker
+from src.bot.exchange.binance import BinanceUM
+from src.bot.exchange.ratelimit import WeightBudget
+from src.bot.exchange.stream import MultiPriceStream
+from src.bot.exchange.user_stream import UserDataStream
+from src.bot.main import cancel_grid, close_grid, deploy_grid, guard_fill_price, guard_prices, make_tracker, stop_grid
+from src.bot.utils.config import Settings, load_grid_settings
+from src.bot.utils.logging import setup_logger
+from src.bot.utils.metrics import start_exporters
+
+@dataclass
+class SymbolGrid:
+    cfg: Settings
+    log: logging.Logger
+    snap: Optional[GridSnapshot] = None
+    low: float = 0.0
+    high: float = 0.0
+    tracker: Optional[FillTracker] = None
+    status: str = "pending"   # pending -> live -> breakout -> closed, or failed
+
+def _deploy(um: BinanceUM, g: SymbolGrid):
+    um.set_isolated(g.cfg.symbol, g.cfg.isolated)
+    um.set_leverage(g.cfg.symbol, leverage=1)
+    g.snap = deploy_grid(um, g.cfg, g.log)
+    g.low, g.high = guard_prices(g.cfg, g.snap.mid)
+    g.status = "live"
+    g.log.info(f"Breakout guard [{g.low:.2f}, {g.high:.2f}]")
+
+async def run_grids(um: BinanceUM, shared: Settings, grids: List[SymbolGrid], log):
+    """Deploy every grid, then watch all of them on one price stream and one user-data stream.
+
+    A grid that fails to deploy, to start its fill tracking or to close is logged and dropped; the
+    others keep running.
+    Returns when every grid has broken out (or failed).
+    """
+    async def deploy(g: SymbolGrid):
+        try:
+            await asyncio.to_thread(_deploy, um, g)
+        except Exception as e:
+            g.status = "failed"
+            g.log.error(f"deploy failed, {g.cfg.symbol} is skipped: {e}")
+
+    await asyncio.gather(*(deploy(g) for g in grids))
+    live: Dict[str, SymbolGrid] = {g.cfg.symbol: g for g in grids if g.status == "live"}
+    if not live:
+        log.error("No grid deployed")
+        return
+    log.info(f"{len(live)}/{len(grids)} grids live. Rate limit headroom: {um.rate_limit_metrics()}")
+
+    closing = []
+    finished = asyncio.Event()
+
+    async def close(g: SymbolGrid, p: float, source: str):
+        try:
+            await asyncio.to_thread(close_grid, um, g.cfg, g.snap, p, source, g.log)
+            g.status = "closed"
+        except Exception as e:
+            g.status = "failed"
+            g.log.error(f"closing {g.cfg.symbol} failed, check its open orders: {e}")
+        if not any(x.status in ("live", "breakout") for x in live.values()):
+            finished.set()
+
+    def hit(g: SymbolGrid, p: float, source: str):
+        if g.status == "live":
+            um.metrics.mark(f"breakout:{g.cfg.symbol}")
+            g.status = "breakout"
+            closing.append(asyncio.create_task(close(g, p, source)))
+
+    def on_price(symbol: str, p: float):
+        g = live.get(symbol)
+        if g is not None and g.status == "live" and (p < g.low or p > g.high):
+            hit(g, p, "client")
+
+    async def start(g: SymbolGrid):
+        if not (g.cfg.track_fills or g.snap.guard_ids) or g.cfg.dry_run:
+            return
+        try:
+            g.tracker = await asyncio.to_thread(make_tracker, um, g.cfg, g.snap,
+                                                lambda o: hit(g, guard_fill_price(o), "exchange"))
+        except Exception as e:
+            # Untracked, its TPs and guard would never be handled: take this grid down, keep the others
+            g.status = "failed"
+            g.log.error(f"fill tracking failed to start, cancelling {g.cfg.symbol}: {e}")
+            try:
+                await asyncio.to_thread(cancel_grid, um, g.cfg, g.snap, g.log)
+            except Exception as e:
+                g.log.error(f"cancelling {g.cfg.symbol} failed, check its open orders: {e}")
+
+    await asyncio.gather(*(start(g) for g in live.values()))
+    if not any(g.status == "live" for g in live.values()):
+        log.error("No grid left running")
+        return
+
+    def on_event(ev: dict):
+        for g in live.values():
+            if g.tracker is None or g.status != "live":
+                continue
+            try:
+                g.tracker.on_event(ev)
+            except Exception as e:
+                g.log.error(f"user-data event failed for {g.cfg.symbol}: {e}")
+
+    def on_reconnect():
+        for g in live.values():
+            if g.tracker is None or g.status != "live":
+                continue
+            try:
+                g.tracker.on_reconnect()
+            except Exception as e:
+                g.log.error(f"reconcile failed for {g.cfg.symbol}: {e}")
+
+    async with aiohttp.ClientSession() as session:
+        stream = MultiPriceStream(live, kind=shared.price_stream, base_url=shared.ws_url, session=session)
+
+        async def rest_fallback():
+            # One all-symbols ticker call covers every grid while the stream is down
+            while True:
+                if not stream.connected.is_set():
+                    try:
+                        for symbol, p in (await asyncio.to_thread(um.prices)).items():
+                            on_price(symbol, p)
+                    except Exception as e:
+                        log.warning(f"REST price fallback failed: {e}")
+                t0 = time.perf_counter()
+                await asyncio.sleep(shared.poll_sec)
+                um.metrics.observe("fgrid_loop_lag_seconds", max(0.0, time.perf_counter() - t0 - shared.poll_sec),
+                                   loop="poll")
+
+        tasks = [asyncio.create_task(stream.run(on_price)), asyncio.create_task(rest_fallback())]
+        if any(g.tracker for g in live.values()):
+            user = UserDataStream(um, base_url=shared.ws_url, session=session)
+            tasks.append(asyncio.create_task(user.run(on_event, on_reconnect)))
+        try:
+            await finished.wait()
+        finally:
+            for t in tasks + closing:
+                t.cancel()
+            await asyncio.gather(*tasks, *closing, return_exceptions=True)
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Run several symbol grids in one process")
+    ap.add_argument("--config", default=os.getenv("GRIDS_FILE", "grids.json"),
+                    help="JSON list of per-symbol Settings blocks (unset fields come from the env)")
+    return ap.parse_args()
+
+def main():
+    a = parse_args()
+    load_dotenv()
+    log = setup_logger("fgrid")
+    shared = Settings()
+    grids = [SymbolGrid(cfg, logging.getLogger(f"fgrid.{cfg.symbol}")) for cfg in load_grid_settings(a.config)]
+
+    # Up to 4 concurrent batch requests per grid while they deploy
+    um = BinanceUM(shared.api_key, shared.api_secret, budget=WeightBudget(shared.rate_limit_headroom),
+                   pool_size=4 * len(grids))
+    stop_metrics = start_exporters(um.metrics, shared, log)
+    try:
+        asyncio.run(run_grids(um, shared, grids, log))
+    except KeyboardInterrupt:
+        for g in grids:
+            if g.status in ("live", "breakout"):
+                try:
+                    stop_grid(um, g.cfg, g.log)
+                except Exception as e:
+                    g.log.error(f"stopping {g.cfg.symbol} failed: {e}")
+    finally:
+        stop_metrics()
+
+if __name__ == "__main__":
+    main()
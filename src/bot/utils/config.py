@@ -1,4 +1,6 @@
+import json
 import os
+from typing import List
 from pydantic import BaseModel, Field
 
 def _b(v, d=False):
@@ -18,6 +20,23 @@ class Settings(BaseModel):
     effective_exposure: float = Field(default_factory=lambda: float(os.getenv("EFFECTIVE_EXPOSURE","1.2")))
     isolated: bool = Field(default_factory=lambda: _b(os.getenv("ISOLATED","true"), True))
     dry_run: bool = Field(default_factory=lambda: _b(os.getenv("DRY_RUN","true"), True))
+    warm_restart: bool = Field(default_factory=lambda: _b(os.getenv("WARM_RESTART","false"), False))
+    state_file: str = Field(default_factory=lambda: os.getenv("STATE_FILE",""))
+    exchange_guard: bool = Field(default_factory=lambda: _b(os.getenv("EXCHANGE_GUARD","false"), False))
+    track_fills: bool = Field(default_factory=lambda: _b(os.getenv("TRACK_FILLS","true"), True))
+    rearm_entries: bool = Field(default_factory=lambda: _b(os.getenv("REARM_ENTRIES","true"), True))
+    price_stream: str = Field(default_factory=lambda: os.getenv("PRICE_STREAM","markPrice"))
+    ws_url: str = Field(default_factory=lambda: os.getenv("WS_URL","wss://fstream.binance.com"))
+    rate_limit_headroom: float = Field(default_factory=lambda: float(os.getenv("RATE_LIMIT_HEADROOM","0.8")))
+    poll_sec: float = Field(default_factory=lambda: float(os.getenv("POLL_SEC","5")))
+    metrics_port: int = Field(default_factory=lambda: int(os.getenv("METRICS_PORT","0")))
+    metrics_host: str = Field(default_factory=lambda: os.getenv("METRICS_HOST","127.0.0.1"))
+    metrics_json: str = Field(default_factory=lambda: os.getenv("METRICS_JSON",""))
+    metrics_json_sec: float = Field(default_factory=lambda: float(os.getenv("METRICS_JSON_SEC","60")))
+
+    @property
+    def state_path(self) -> str:
+        return self.state_file or os.path.join("data", f"grid_{self.symbol}.json")
 
     def validate(self):
         if self.grid_levels < 2:
@@ -26,5 +45,37 @@ class Settings(BaseModel):
             raise ValueError("STEP_PCT must be > 0")
         if self.tp_pct <= 0:
             raise ValueError("TP_PCT must be > 0")
+        if self.price_stream not in ("markPrice", "bookTicker"):
+            raise ValueError("PRICE_STREAM must be markPrice or bookTicker")
+        if not 0 < self.rate_limit_headroom <= 1:
+            raise ValueError("RATE_LIMIT_HEADROOM must be in (0, 1]")
+        if self.metrics_json and self.metrics_json_sec <= 0:
+            raise ValueError("METRICS_JSON_SEC must be > 0")
         if not self.dry_run and (not self.api_key or not self.api_secret):
             raise ValueError("Live trading requires BINANCE_API_KEY and BINANCE_API_SECRET")
+
+# One REST client, price stream and user-data stream serve every grid, so these come from the env only
+SHARED_FIELDS = {"api_key", "api_secret", "price_stream", "ws_url", "rate_limit_headroom", "poll_sec",
+                 "metrics_port", "metrics_host", "metrics_json", "metrics_json_sec"}
+
+def load_grid_settings(path: str) -> List[Settings]:
+    """Per-symbol ``Settings`` from a JSON list of blocks; anything a block leaves out comes from the env."""
+    with open(path) as f:
+        blocks = json.load(f)
+    if not isinstance(blocks, list) or not blocks:
+        raise ValueError(f"{path}: expected a non-empty JSON list of grid blocks")
+    out = []
+    for b in blocks:
+        unknown = set(b) - set(Settings.model_fields)
+        if unknown:
+            raise ValueError(f"{path}: unknown settings {sorted(unknown)}")
+        if set(b) & SHARED_FIELDS:
+            raise ValueError(f"{path}: {sorted(set(b) & SHARED_FIELDS)} are shared by all grids, set them in the env")
+        cfg = Settings(**b)
+        cfg.validate()
+        out.append(cfg)
+    for attr in ("symbol", "state_path"):
+        values = [getattr(c, attr) for c in out]
+        if len(set(values)) != len(values):
+            raise ValueError(f"{path}: every grid needs its own {attr}")
+    return out
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Seconds, from a warm REST call (~1 ms) to a slow full grid deploy
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "fgrid_rest_latency_seconds": "REST call latency per endpoint, rate-limit waits excluded",
+    "fgrid_rest_errors_total": "REST calls that raised, per endpoint and HTTP/Binance error code",
+    "fgrid_rate_limited_total": "418/429 responses that paused all calls",
+    "fgrid_orders_rejected_total": "Orders rejected by the exchange, per error code",
+    "fgrid_order_retries_total": "Orders re-rounded and resent after a filter reject",
+    "fgrid_loop_lag_seconds": "How late a periodic loop woke up after its sleep",
+    "fgrid_deploy_seconds": "Full grid deploy (cancel, place, guard stops, snapshot)",
+    "fgrid_guard_to_cancel_seconds": "Breakout seen -> grid cancelled on the exchange",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        out, n = [], 0
+        for le, c in zip([*map(repr, self.bounds), "+Inf"], self.counts):
+            n += c
+            out.append((le, n))
+        return out
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt(labels: Labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}" if labels else ""
+
+class Metrics:
+    """In-process counters, latency histograms and gauges for the live bot.
+
+    Recording is a dict lookup and a few additions under one lock (a few microseconds), so it can
+    sit on every REST call. ``render`` gives the Prometheus text format, ``snapshot`` the
+    same data as a dict for the JSON dump.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.gauge_sources: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self.marks: Dict[str, float] = {}
+
+    def inc(self, name: str, n: float = 1, **labels):
+        key = _labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + n
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = _labels(labels)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = Histogram()
+            h.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def gauges(self, prefix: str, source: Callable[[], Dict[str, float]]):
+        """Read ``source()`` at export time; each key becomes gauge ``<prefix>_<key>``."""
+        self.gauge_sources[prefix] = source
+
+    def mark(self, event: str):
+        """Remember when ``event`` happened, for a later ``since``."""
+        self.marks[event] = time.perf_counter()
+
+    def since(self, event: str) -> Optional[float]:
+        """Seconds since ``event`` was marked (and forget it), or None if it was not."""
+        t = self.marks.pop(event, None)
+        return None if t is None else time.perf_counter() - t
+
+    def _gauge_values(self) -> Dict[str, float]:
+        out = {}
+        for prefix, source in list(self.gauge_sources.items()):
+            for k, v in source().items():
+                out[f"{prefix}_{k}"] = float(v)
+        return out
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            counters = {n: dict(s) for n, s in self.counters.items()}
+            hists = {n: {k: (h.cumulative(), h.sum, h.count) for k, h in s.items()} for n, s in self.histograms.items()}
+        for name, series in sorted(counters.items()):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            lines += [f"{name}{_fmt(k)} {v:g}" for k, v in sorted(series.items())]
+        for name, series in sorted(hists.items()):
+            lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            for k, (buckets, total, count) in sorted(series.items()):
+                lines += [f"{name}_bucket{_fmt(k + (('le', le),))} {n}" for le, n in buckets]
+                lines += [f"{name}_sum{_fmt(k)} {total:.6f}", f"{name}_count{_fmt(k)} {count}"]
+        for name, v in sorted(self._gauge_values().items()):
+            lines += [f"# TYPE {name} gauge", f"{name} {v:g}"]
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counters = {n: [{"labels": dict(k), "value": v} for k, v in sorted(s.items())]
+                        for n, s in self.counters.items()}
+            hists = {n: [{"labels": dict(k), "count": h.count, "sum": h.sum, "buckets": dict(h.cumulative())}
+                         for k, h in sorted(s.items())] for n, s in self.histograms.items()}
+        return {"time": time.time(), "counters": counters, "histograms": hists, "gauges": self._gauge_values()}
+
+    def dump_json(self, path: str):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=1)
+        os.replace(tmp, path)
+
+def serve(metrics: Metrics, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """``GET /metrics`` in Prometheus text format, from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # scrapes every few seconds would flood the bot's log
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def start_exporters(metrics: Metrics, cfg, log: logging.Logger) -> Callable[[], None]:
+    """Start what ``cfg`` enables (``METRICS_PORT``, ``METRICS_JSON``); returns a stop function that
+    also writes a last JSON dump."""
+    server = None
+    if cfg.metrics_port:
+        server = serve(metrics, cfg.metrics_port, cfg.metrics_host)
+        log.info(f"Metrics on http://{cfg.metrics_host}:{cfg.metrics_port}/metrics")
+    stop = threading.Event()
+    dumper = None
+    if cfg.metrics_json:
+        def dump_loop():
+            while not stop.wait(cfg.metrics_json_sec):
+                try:
+                    metrics.dump_json(cfg.metrics_json)
+                except OSError as e:
+                    log.warning(f"metrics dump failed: {e}")
+
+        dumper = threading.Thread(target=dump_loop, name="metrics-json", daemon=True)
+        dumper.start()
+        log.info(f"Metrics JSON -> {cfg.metrics_json} every {cfg.metrics_json_sec:g}s")
+
+    def close():
+        stop.set()
+        if dumper is not None:
+            dumper.join()
+            metrics.dump_json(cfg.metrics_json)
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return close